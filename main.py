@@ -1,6 +1,8 @@
 import argparse
 import logging
 import os
+import sys
+import types
 from typing import List, Dict
 
 import yaml
@@ -8,6 +10,8 @@ from colorama import Fore, Style
 
 from src.converter import convert_single_file, convert_multiple_files
 from src.logger_config import setup_logging
+from src.rule_compiler import compile_rules
+from src.yaml_loader import SafeLoader
 
 
 def parse_sequence_overrides(overrides: List[str]) -> Dict[str, int]:
@@ -27,64 +31,110 @@ def parse_sequence_overrides(overrides: List[str]) -> Dict[str, int]:
 
 
 def get_yaml_files_in_directory(directory: str) -> List[str]:
-    """获取指定目录下所有 .yml 和 .yaml 文件。"""
+    """获取指定目录下所有 .yml 和 .yaml 文件 (递归，结果已排序)。"""
     yaml_files = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith((".yml", ".yaml")):
-                yaml_files.append(os.path.join(root, file))
+    pending_dirs = [directory]
+    while pending_dirs:
+        try:
+            entries = os.scandir(pending_dirs.pop())
+        except OSError:
+            continue  # 与 os.walk 一致，忽略无法读取的目录
+        with entries:
+            for entry in entries:
+                # DirEntry 缓存了目录项类型，通常无需额外的 stat 调用
+                if entry.is_dir():
+                    if not entry.is_symlink():  # 与 os.walk 一致，不进入符号链接目录
+                        pending_dirs.append(entry.path)
+                elif entry.name.endswith((".yml", ".yaml")):
+                    yaml_files.append(entry.path)
     return sorted(yaml_files)
 
 
+# 输出被重定向到文件或管道时不使用颜色代码
+if not sys.stdout.isatty():
+    Fore = types.SimpleNamespace(BLUE="", CYAN="", GREEN="", MAGENTA="", YELLOW="")
+    Style = types.SimpleNamespace(BRIGHT="", RESET_ALL="")
+
+# 命令行帮助信息只在导入时构建一次
+DESCRIPTION = (
+    f"{Fore.BLUE}{Style.BRIGHT}YAML 物品配置转换工具{Style.RESET_ALL}\n"
+    f"{Fore.MAGENTA}  🚀 快速、可配置、现代化 YAML 数据转换 CLI{Style.RESET_ALL}"
+)
+INPUT_HELP = (
+    f"{Fore.CYAN}旧版物品配置文件路径 或 包含旧版文件的目录路径。{Style.RESET_ALL}\n"
+    f"  必须指定输入文件或目录。{Style.RESET_ALL}"
+)
+RULES_HELP = f"{Fore.MAGENTA}转换规则文件路径 (例如: conversion_rules.yml){Style.RESET_ALL}"
+OUTPUT_HELP = (
+    f"{Fore.YELLOW}新版配置文件输出路径。{Style.RESET_ALL}\n"
+    f"  如果输入是单个文件，这是输出文件路径 (默认: converted_items.yml)。{Style.RESET_ALL}\n"
+    f"  如果输入是目录，这是输出目录 (默认: 'converted_output/').{Style.RESET_ALL}"
+)
+BATCH_HELP = f"{Fore.GREEN}启用批量转换模式。如果输入是目录，将转换目录下所有文件。{Style.RESET_ALL}"
+DEBUG_HELP = f"{Fore.BLUE}启用调试模式，显示详细日志信息。{Style.RESET_ALL}"
+SEQUENCE_START_HELP = (
+    f"{Fore.YELLOW}覆盖规则文件中序列字段的起始值。{Style.RESET_ALL}\n"
+    f"  格式: --sequence-start path1:value1 path2:value2\n"
+    f"  示例: --sequence-start custom-model-data:50000\n"
+    f"  注意: 此参数会覆盖 rules 文件中为该路径定义的 start 值。{Style.RESET_ALL}"
+)
+JOBS_HELP = (
+    f"{Fore.GREEN}批量转换模式下的并行进程数 (默认: CPU 核心数)。{Style.RESET_ALL}\n"
+    f"  设置为 1 时按顺序逐个转换文件。{Style.RESET_ALL}"
+)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
-        description=f"{Fore.BLUE}{Style.BRIGHT}YAML 物品配置转换工具{Style.RESET_ALL}\n"
-        f"{Fore.MAGENTA}  🚀 快速、可配置、现代化 YAML 数据转换 CLI{Style.RESET_ALL}",
+        description=DESCRIPTION,
         formatter_class=argparse.RawTextHelpFormatter,
     )
     parser.add_argument(
         "-i",
         "--input",
         type=str,
-        help=f"{Fore.CYAN}旧版物品配置文件路径 或 包含旧版文件的目录路径。{Style.RESET_ALL}\n"
-        f"  必须指定输入文件或目录。{Style.RESET_ALL}",
+        help=INPUT_HELP,
     )
     parser.add_argument(
         "-r",
         "--rules",
         type=str,
         required=True,
-        help=f"{Fore.MAGENTA}转换规则文件路径 (例如: conversion_rules.yml){Style.RESET_ALL}",
+        help=RULES_HELP,
     )
     parser.add_argument(
         "-o",
         "--output",
         type=str,
-        help=f"{Fore.YELLOW}新版配置文件输出路径。{Style.RESET_ALL}\n"
-        f"  如果输入是单个文件，这是输出文件路径 (默认: converted_items.yml)。{Style.RESET_ALL}\n"
-        f"  如果输入是目录，这是输出目录 (默认: 'converted_output/').{Style.RESET_ALL}",
+        help=OUTPUT_HELP,
     )
     parser.add_argument(
         "--batch",
         action="store_true",
-        help=f"{Fore.GREEN}启用批量转换模式。如果输入是目录，将转换目录下所有文件。{Style.RESET_ALL}",
+        help=BATCH_HELP,
     )
     parser.add_argument(
         "--debug",
         action="store_true",
-        help=f"{Fore.BLUE}启用调试模式，显示详细日志信息。{Style.RESET_ALL}",
+        help=DEBUG_HELP,
     )
     parser.add_argument(
         "--sequence-start",
         nargs='*',
-        help=f"{Fore.YELLOW}覆盖规则文件中序列字段的起始值。{Style.RESET_ALL}\n"
-        f"  格式: --sequence-start path1:value1 path2:value2\n"
-        f"  示例: --sequence-start custom-model-data:50000\n"
-        f"  注意: 此参数会覆盖 rules 文件中为该路径定义的 start 值。{Style.RESET_ALL}",
+        help=SEQUENCE_START_HELP,
         default=[]
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help=JOBS_HELP,
+    )
 
     args = parser.parse_args()
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs 必须是大于 0 的整数。")
 
     setup_logging(debug_mode=args.debug)
     logger = logging.getLogger('YAMLConverter')
@@ -100,7 +150,7 @@ def main() -> None:
     # 规则文件格式校验
     try:
         with open(args.rules, 'r', encoding='utf-8') as f:
-            rules_data = yaml.safe_load(f)
+            rules_data = yaml.load(f, Loader=SafeLoader)
         if not isinstance(rules_data, dict) or 'rules' not in rules_data:
             logger.error(f"✖️ 错误: 规则文件 '{args.rules}' 格式不正确，缺少 'rules' 键。")
             return
@@ -210,12 +260,12 @@ def main() -> None:
     if len(input_paths) == 1 and not args.batch:  # 单文件模式
         convert_single_file(
             input_paths[0],
-            rules_list,
+            compile_rules(rules_list),
             output_path,
             sequence_overrides=sequence_overrides
         )
     elif len(input_paths) > 0 and args.batch:  # 批量模式
-        convert_multiple_files(input_paths, os.path.abspath(args.rules), output_path, sequence_overrides=sequence_overrides)
+        convert_multiple_files(input_paths, rules_list, output_path, sequence_overrides=sequence_overrides, jobs=args.jobs)
     else:
         logger.warning(f"🤔 未执行任何转换操作。请检查输入参数。")
 
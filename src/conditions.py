@@ -0,0 +1,254 @@
+import logging
+import re
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from src.expressions import compile_expression, evaluate_expression
+from src.utils import (Template, TemplatedDict, compile_regex, compile_templates, evaluate_condition,
+                       find_placeholder_names, render_templates, resolve_path, split_path)
+
+logger = logging.getLogger('YAMLConverter')
+
+# 编译后的条件：predicate(item_config, context, resolved_paths) -> bool
+# resolved_paths 为可选的 {路径: 值} 缓存，同一内容项的多个条件读取同一路径时只查找一次
+ConditionPredicate = Callable[[dict, Dict[str, Any], Optional[dict]], bool]
+
+
+def _compile_expression_condition(source: str) -> ConditionPredicate:
+    expression = compile_expression(source)
+
+    def predicate(item_config: dict, context: Dict[str, Any], resolved_paths: Optional[dict] = None) -> bool:
+        result = evaluate_expression(expression, item_config, context)
+        logger.debug("  - 评估条件表达式 '%s': 结果 '%s'", expression, result)
+        return bool(result)
+    return predicate
+
+
+def _try_compile_regex(pattern: Any) -> Optional[re.Pattern]:
+    """
+    编译条件中的正则；模式无效时返回 None。
+    错误推迟到求值时 (遇到字符串值) 再由 compile_regex 抛出，与之前的行为一致，
+    规则文件中一个无效的正则不会导致整个规则集无法编译。
+    """
+    try:
+        return compile_regex(pattern)
+    except (re.error, TypeError):
+        return None
+
+
+# min/max 检查接受的数值类型 (与 isinstance(value, (int, float)) 一致)，精确类型命中时无需 isinstance
+_NUMERIC_TYPES = frozenset((int, float, bool))
+
+
+def _compile_static_condition(condition: dict) -> ConditionPredicate:
+    """
+    将不含上下文占位符的条件字典编译为闭包，检查项与 utils.evaluate_condition 完全一致，
+    但字段是否存在、期望值、正则等都在编译时确定。
+    """
+    path = condition.get('path')
+    if not path:
+        def missing_path(item_config: dict, context: Dict[str, Any], resolved_paths: Optional[dict] = None) -> bool:
+            logger.warning(f"规则中的条件缺少 'path' 字段: {condition}")
+            return False
+        return missing_path
+
+    # 路径在编译时拆分一次；非字符串路径在查找时再处理 (保持原有行为)
+    parts = split_path(path) if isinstance(path, str) else None
+    check_exists = 'exists' in condition
+    exists = condition.get('exists')
+    check_value = 'value' in condition
+    expected_value = condition.get('value')
+    check_regex = 'regex_match' in condition
+    regex_pattern = condition.get('regex_match')
+    regex = _try_compile_regex(regex_pattern) if check_regex else None
+    check_min = 'min' in condition
+    min_value = condition.get('min')
+    check_max = 'max' in condition
+    max_value = condition.get('max')
+    check_range = check_min or check_max
+    requires_value = check_value or check_regex or check_range
+
+    def predicate(item_config: dict, context: Dict[str, Any], resolved_paths: Optional[dict] = None) -> bool:
+        value_at_path = resolve_path(item_config, path, resolved_paths, parts)
+        logger.debug("  - 评估条件 '%s': 当前值 '%s'", path, value_at_path)
+
+        if check_exists:
+            if exists is True and value_at_path is None:
+                logger.debug("    - 条件 '%s' exists: True 未满足 (值为 None)", path)
+                return False
+            if exists is False and value_at_path is not None:
+                logger.debug("    - 条件 '%s' exists: False 未满足 (值不为 None)", path)
+                return False
+            logger.debug("    - 条件 '%s' exists: %s 满足", path, exists)
+
+        if value_at_path is None and requires_value:
+            logger.debug("    - 条件 '%s' 要求检查值但路径不存在。", path)
+            return False
+
+        if check_value:
+            if value_at_path != expected_value:
+                logger.debug("    - 条件 '%s' value: '%s' 未满足 (实际值: '%s')", path, expected_value, value_at_path)
+                return False
+            logger.debug("    - 条件 '%s' value: '%s' 满足", path, expected_value)
+
+        if check_regex:
+            if not isinstance(value_at_path, str):
+                logger.debug("    - 条件 '%s' regex_match 未满足 (值不是字符串: %s)", path, type(value_at_path))
+                return False
+            # 无效的模式在此处重新编译并抛出异常
+            if not (regex or compile_regex(regex_pattern)).match(value_at_path):
+                logger.debug("    - 条件 '%s' regex_match: '%s' 未满足 (实际值: '%s')", path, regex_pattern, value_at_path)
+                return False
+            logger.debug("    - 条件 '%s' regex_match: '%s' 满足", path, regex_pattern)
+
+        if check_range:
+            if type(value_at_path) not in _NUMERIC_TYPES and not isinstance(value_at_path, (int, float)):
+                logger.debug("    - 条件 '%s' min/max 未满足 (值不是数字: %s)", path, type(value_at_path))
+                return False
+            if check_min and value_at_path < min_value:
+                logger.debug("    - 条件 '%s' min: '%s' 未满足 (实际值: '%s')", path, min_value, value_at_path)
+                return False
+            if check_max and value_at_path > max_value:
+                logger.debug("    - 条件 '%s' max: '%s' 未满足 (实际值: '%s')", path, max_value, value_at_path)
+                return False
+            logger.debug("    - 条件 '%s' min/max 满足", path)
+
+        return True
+
+    return predicate
+
+
+def _generate_static_condition(condition: dict) -> Optional[ConditionPredicate]:
+    """
+    为不含上下文占位符的条件生成 Python 源码并编译为函数，检查项与 _compile_static_condition 相同，
+    路径查找同样使用 resolve_path (共享前缀缓存)，但只生成条件实际需要的检查，
+    期望值、正则等作为常量绑定，且不输出调试日志。
+
+    Returns:
+        Optional[ConditionPredicate]: 生成的函数；路径缺失或不是字符串、正则无效时返回 None，交由闭包处理。
+    """
+    path = condition.get('path')
+    if not path or not isinstance(path, str):
+        return None
+    regex = _try_compile_regex(condition['regex_match']) if 'regex_match' in condition else None
+    if 'regex_match' in condition and regex is None:
+        return None
+
+    namespace = {'_NUMERIC_TYPES': _NUMERIC_TYPES, '_PATH': path, '_PARTS': split_path(path),
+                 '_resolve_path': resolve_path}
+    lines = [
+        "def predicate(item_config, context, resolved_paths=None):",
+        "    value = _resolve_path(item_config, _PATH, resolved_paths, _PARTS)",
+    ]
+
+    exists = condition.get('exists')
+    if 'exists' in condition and exists is True:
+        lines.append("    if value is None: return False")
+    elif 'exists' in condition and exists is False:
+        lines.append("    if value is not None: return False")
+
+    check_value = 'value' in condition
+    check_regex = 'regex_match' in condition
+    check_min = 'min' in condition
+    check_max = 'max' in condition
+    if check_value or check_regex or check_min or check_max:
+        lines.append("    if value is None: return False")
+    if check_value:
+        namespace['_EXPECTED'] = condition['value']
+        lines.append("    if value != _EXPECTED: return False")
+    if check_regex:
+        namespace['_REGEX'] = regex
+        lines.append("    if not isinstance(value, str) or not _REGEX.match(value): return False")
+    if check_min or check_max:
+        lines.append("    if type(value) not in _NUMERIC_TYPES and not isinstance(value, (int, float)): return False")
+        if check_min:
+            namespace['_MIN'] = condition['min']
+            lines.append("    if value < _MIN: return False")
+        if check_max:
+            namespace['_MAX'] = condition['max']
+            lines.append("    if value > _MAX: return False")
+    lines.append("    return True")
+
+    exec(compile("\n".join(lines), f"<condition {path}>", "exec"), namespace)
+    return namespace['predicate']
+
+
+# 每个含占位符的条件最多缓存的已解析条件数量 (例如引用 content_id 的条件，每个内容项各不相同)
+_RESOLVED_CONDITIONS_MAX = 1024
+
+
+def _compile_dynamic_condition(condition: dict, context_names: Iterable[str]) -> ConditionPredicate:
+    """
+    编译引用了上下文变量的条件字典。
+    不含占位符的字段在编译时确定，只有含占位符的字段在每次调用时渲染；
+    渲染后的完整条件编译为静态闭包并按渲染结果缓存，相同的上下文值不会重复编译。
+    """
+    templated = compile_templates(condition, context_names)
+    if type(templated) is not TemplatedDict or any(type(key) is Template for key in templated):
+        # 占位符出现在字段名中，无法区分静态与动态字段
+        def dynamic(item_config: dict, context: Dict[str, Any], resolved_paths: Optional[dict] = None) -> bool:
+            return evaluate_condition(item_config, condition, context, logger, resolved_paths)
+        return dynamic
+
+    # compile_templates 对不含占位符的值原样返回
+    dynamic_fields = [(key, value) for key, value in templated.items() if value is not condition[key]]
+    resolved: Dict[tuple, ConditionPredicate] = {}
+
+    def predicate(item_config: dict, context: Dict[str, Any], resolved_paths: Optional[dict] = None) -> bool:
+        rendered = tuple(render_templates(value, context) for _, value in dynamic_fields)
+        # 1、1.0 与 True 的哈希相同且相等，但 exists 等检查区分它们，缓存键需要包含类型
+        cache_key = (rendered, tuple(map(type, rendered)))
+        try:
+            compiled = resolved.get(cache_key)
+            cacheable = True
+        except TypeError:  # 渲染结果为列表或字典，不能作为缓存键
+            compiled = None
+            cacheable = False
+
+        if compiled is None:
+            resolved_condition = dict(condition)
+            for (key, _), value in zip(dynamic_fields, rendered):
+                resolved_condition[key] = value
+            compiled = _compile_static_condition(resolved_condition)
+            if cacheable:
+                if len(resolved) >= _RESOLVED_CONDITIONS_MAX:
+                    resolved.clear()
+                resolved[cache_key] = compiled
+        return compiled(item_config, context, resolved_paths)
+    return predicate
+
+
+def compile_condition(condition: Any, context_names: Iterable[str]) -> ConditionPredicate:
+    """
+    将规则中的单个条件编译为 predicate(item_config, context, resolved_paths=None) -> bool。
+
+    - 字符串条件视为表达式，按表达式结果的真假判断 (见 RULES.md 的表达式语法)。
+    - 字典条件在不引用任何上下文变量时，编译为预先解析好所有检查项的闭包
+      (未启用调试日志时为按条件生成的函数，见 _generate_static_condition)；
+      引用了上下文变量 (例如 path: "{content_type}.id") 时，每次调用只渲染含占位符的字段，
+      渲染后的条件同样编译为闭包并按渲染结果缓存。
+
+    Args:
+        condition (any): 规则文件中 `conditions` 列表的一项。
+        context_names (Iterable[str]): 该规则集中可用的上下文变量名 (包括 content_id 和 content_type)。
+
+    Returns:
+        ConditionPredicate: 编译后的条件。
+    """
+    if isinstance(condition, str):
+        return _compile_expression_condition(condition)
+
+    if not isinstance(condition, dict):
+        def invalid(item_config: dict, context: Dict[str, Any], resolved_paths: Optional[dict] = None) -> bool:
+            logger.warning(f"规则中的条件格式无效 (应为字典或表达式字符串): {condition}")
+            return False
+        return invalid
+
+    if find_placeholder_names(condition).isdisjoint(context_names):
+        # 调试模式下使用带日志的闭包，否则使用生成的函数
+        if not logger.isEnabledFor(logging.DEBUG):
+            generated = _generate_static_condition(condition)
+            if generated is not None:
+                return generated
+        return _compile_static_condition(condition)
+
+    return _compile_dynamic_condition(condition, context_names)
@@ -1,15 +1,20 @@
-import copy
 import logging
 import os
-import re
-from typing import List, Tuple, Optional, Dict, Any
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import List, Tuple, Optional, Dict, Any, Iterable, Iterator, TextIO
 
 import yaml
-from asteval import Interpreter
 from colorama import Fore, Style
 from tqdm import tqdm
 
-from src.utils import get_nested_value, set_nested_value, delete_nested_value, evaluate_condition, process_placeholders
+from src.expressions import evaluate_expression
+from src.logger_config import setup_logging
+from src.rule_compiler import (CompiledRule, CompiledNestedRule, CompiledRuleSet, compile_rules,
+                               split_path_list, split_path_mapping, split_rename_mapping)
+from src.yaml_loader import SafeLoader, SafeDumper
+from src.utils import get_by_tuple, set_by_tuple, delete_by_tuple, split_path, render_templates, fast_clone
 
 logger = logging.getLogger('YAMLConverter')
 
@@ -28,30 +33,17 @@ def process_dynamic_context(context_definitions: Dict[str, Any], content_config:
     """
     # 从基础上下文开始 (content_id, content_type)
     final_context = base_context.copy()
-    
-    aeval = Interpreter(no_print=True)
-    # 用于上下文评估的符号表
-    aeval.symtable.update({
-        "get": get_nested_value,
-        "str": str,
-        "int": int,
-        "float": float,
-        "len": len,
-        "data": content_config,
-    })
 
     # 按顺序处理定义，以允许后续变量引用前面的变量
     for var_name, var_config in context_definitions.items():
-        # 在每次迭代时更新符号表中的 'context'，
-        # 这样表达式就可以通过 `context['var']` 引用已定义的上下文变量。
-        aeval.symtable['context'] = final_context
-
         final_value = None
         if isinstance(var_config, dict) and 'expression' in var_config:
             expression = var_config['expression']
             try:
-                final_value = aeval.eval(expression)
-                logger.debug(f"      上下文变量 '{var_name}' 的计算结果为: {final_value}")
+                # 每次求值时重新绑定 final_context，
+                # 这样表达式就可以直接按名称或通过 `context['var']` 引用已定义的上下文变量。
+                final_value = evaluate_expression(expression, content_config, final_context)
+                logger.debug("      上下文变量 '%s' 的计算结果为: %s", var_name, final_value)
             except Exception as e:
                 logger.error(f"      ✖️ 上下文变量 '{var_name}' 的表达式评估失败: {e}")
                 if 'default_value' in var_config:
@@ -67,338 +59,576 @@ def process_dynamic_context(context_definitions: Dict[str, Any], content_config:
 
     return final_context
 
-def apply_actions(content_config: dict, actions: dict, context: dict, sequence_counters: dict, rule_name: str, sequence_overrides: Optional[Dict[str, int]] = None) -> None:
+class SequenceCounters:
+    """
+    单个文件内所有 sequence 动作的计数器。
+
+    计数器存放在一个列表中：不含占位符的序列使用编译时分配的槽位 (CompiledRuleSet.sequence_slots)，
+    其余序列在运行时按计数器键分配新的槽位。两者的键形式相同，因此共享 id 的序列无论是否含有占位符
+    都会落到同一个计数器上。尚未使用的计数器值为 None，首次使用时才确定起始值。
+    """
+    __slots__ = ('values', 'static_slots', 'dynamic_slots')
+
+    def __init__(self, sequence_slots: Dict[Any, int]):
+        self.values: List[Any] = [None] * len(sequence_slots)
+        self.static_slots = sequence_slots
+        self.dynamic_slots: Dict[Any, int] = {}
+
+    def slot_for(self, counter_key: Any) -> int:
+        slot = self.static_slots.get(counter_key)
+        if slot is None:
+            slot = self.dynamic_slots.get(counter_key)
+            if slot is None:
+                slot = len(self.values)
+                self.values.append(None)
+                self.dynamic_slots[counter_key] = slot
+        return slot
+
+
+def _log_unnamed_sequence_error(path: str) -> None:
+    logger.error(f"      ✖️ 错误: 路径 '{path}' 的 sequence 操作位于一个未命名的规则中，并且没有提供 'id'。")
+    logger.error(f"        为了确保序列不互相干扰，请为该规则命名或为 sequence 提供一个 'id'。")
+
+
+def _apply_sequence(content_config: dict, path: str, parts: Tuple[str, ...], slot: int, start_value: Any, step_value: Any, format_string: Any,
+                    override_key: Any, sequence_counters: SequenceCounters, sequence_overrides: Optional[Dict[str, int]]) -> None:
+    counters = sequence_counters.values
+    current_value = counters[slot]
+    if current_value is None:
+        current_value = start_value
+        if sequence_overrides and override_key in sequence_overrides:
+            current_value = sequence_overrides[override_key]
+            logger.debug("      序列 '%s' 的起始值被命令行覆盖为 %s", override_key, current_value)
+
+    if format_string and isinstance(format_string, str):
+        final_value_to_set = format_string.replace('{counter}', str(current_value))
+        logger.debug("      字段 '%s' 已使用格式 '%s' 和上下文解析为 '%s'", path, format_string, final_value_to_set)
+    else:
+        final_value_to_set = current_value
+        logger.debug("      字段 '%s' 已设置为 %s (下一次递增/减 %s)", path, current_value, step_value)
+
+    set_by_tuple(content_config, parts, final_value_to_set)
+    counters[slot] = current_value + step_value
+
+
+def apply_actions(content_config: dict, rule: CompiledNestedRule, context: dict, sequence_counters: SequenceCounters, sequence_overrides: Optional[Dict[str, int]] = None) -> None:
     """
     应用规则中的操作。
     content_config: 当前正在转换的内容（例如一个物品或一个方块的配置）
-    actions: 来自规则的动作字典
+    rule: 当前正在执行的已编译规则，其名称用于创建隔离的序列计数器。
     context: 已解析的上下文
-    sequence_counters: 存储所有序列计数器的字典
-    rule_name: 当前正在执行的规则名称，用于创建隔离的序列计数器。
+    sequence_counters: 当前文件的序列计数器
     sequence_overrides: 命令行覆盖
     """
+    actions = rule.actions
+    rule_name = rule.display_name
 
     if actions.get('skip', False):
-        logger.debug(f"    规则动作包含 'skip: true'，跳过所有操作。")
+        logger.debug("    规则动作包含 'skip: true'，跳过所有操作。")
         return
     
+    compiled_actions = rule.compiled_actions
+    # 调试输出中的路径列表和映射需要额外构建，非调试级别时跳过
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+
     if 'delete' in actions:
-        processed_delete_paths = process_placeholders(actions['delete'], context)
-        logger.debug(f"    正在执行删除操作: {processed_delete_paths}")
-        for path_to_delete in processed_delete_paths:
-            delete_nested_value(content_config, path_to_delete)
-            logger.debug(f"      已删除字段: {path_to_delete}")
+        delete_entries = compiled_actions.delete
+        if delete_entries is None:
+            delete_entries = split_path_list(render_templates(compiled_actions.templates['delete'], context))
+        if debug_enabled:
+            logger.debug("    正在执行删除操作: %s", [path for path, _ in delete_entries])
+        for path_to_delete, parts in delete_entries:
+            delete_by_tuple(content_config, parts)
+            logger.debug("      已删除字段: %s", path_to_delete)
 
     if 'rename' in actions:
-        processed_rename_map = process_placeholders(actions['rename'], context)
-        logger.debug(f"    正在执行重命名操作: {processed_rename_map}")
-        for old_path, new_path in processed_rename_map.items():
-            value = get_nested_value(content_config, old_path)
+        rename_entries = compiled_actions.rename
+        if rename_entries is None:
+            rename_entries = split_rename_mapping(render_templates(compiled_actions.templates['rename'], context))
+        if debug_enabled:
+            logger.debug("    正在执行重命名操作: %s", {old: new for old, _, new, _ in rename_entries})
+        for old_path, old_parts, new_path, new_parts in rename_entries:
+            value = get_by_tuple(content_config, old_parts)
             if value is not None:
-                set_nested_value(content_config, new_path, value)
-                delete_nested_value(content_config, old_path)
-                logger.debug(f"      已重命名字段: {old_path} -> {new_path}")
+                set_by_tuple(content_config, new_parts, value)
+                delete_by_tuple(content_config, old_parts)
+                logger.debug("      已重命名字段: %s -> %s", old_path, new_path)
             else:
-                logger.debug(f"      字段 '{old_path}' 不存在，跳过重命名。")
+                logger.debug("      字段 '%s' 不存在，跳过重命名。", old_path)
 
     if 'set' in actions:
-        processed_set_map = process_placeholders(actions['set'], context)
-        logger.debug(f"    正在执行设置/添加操作: {processed_set_map}")
-        for path, value_config in processed_set_map.items():
+        set_entries = compiled_actions.set
+        if set_entries is None:
+            set_entries = split_path_mapping(render_templates(compiled_actions.templates['set'], context))
+        if debug_enabled:
+            logger.debug("    正在执行设置/添加操作: %s", {path: value for path, _, value in set_entries})
+        for path, parts, value_config in set_entries:
             final_value = None
             
             if isinstance(value_config, dict) and 'expression' in value_config:
                 expression = value_config['expression']
-                logger.debug(f"      路径 '{path}': 正在评估表达式...")
-                
-                aeval = Interpreter(no_print=True)
-                aeval.symtable.update({
-                    "upper": str.upper,
-                    "lower": str.lower,
-                    "replace": lambda s, old, new: str(s).replace(old, new),
-                    "split": lambda s, sep: str(s).split(sep),
-                    "str": str,
-                    "int": int,
-                    "float": float,
-                    "len": len,
-                    "data": content_config, 
-                    "get": get_nested_value,
-                })
-                aeval.symtable.update(context)
-                
+                logger.debug("      路径 '%s': 正在评估表达式...", path)
+
                 try:
-                    final_value = aeval.eval(expression)
-                    logger.debug(f"        表达式 '{expression}' 的计算结果为: {final_value}")
+                    # 表达式结果可能直接引用内容配置中的对象 (例如 data['stats'])，复制一份，
+                    # 避免同一对象出现在两处，导出时生成锚点和别名
+                    final_value = fast_clone(evaluate_expression(expression, content_config, context))
+                    logger.debug("        表达式 '%s' 的计算结果为: %s", expression, final_value)
                 except Exception as e:
                     logger.error(f"        ✖️ 路径 '{path}' 的表达式评估失败: {e}")
                     if 'default_value' in value_config:
-                        final_value = value_config['default_value']
+                        final_value = fast_clone(value_config['default_value'])
                         logger.warning(f"        已使用提供的默认值: {final_value}")
                     else:
                         continue 
             else:
-                final_value = value_config
+                # 规则中的值会被多个内容项使用，写入前复制一份
+                final_value = fast_clone(value_config)
 
-            set_nested_value(content_config, path, final_value)
-            logger.debug(f"      已设置字段 '{path}'。")
+            set_by_tuple(content_config, parts, final_value)
+            logger.debug("      已设置字段 '%s'。", path)
 
     if 'append' in actions:
-        processed_append_map = process_placeholders(actions['append'], context)
-        logger.debug(f"    正在执行 append 操作: {processed_append_map}")
-        for path, elements_to_add in processed_append_map.items():
-            current_list = get_nested_value(content_config, path)
+        append_entries = compiled_actions.append
+        if append_entries is None:
+            append_entries = split_path_mapping(render_templates(compiled_actions.templates['append'], context))
+        if debug_enabled:
+            logger.debug("    正在执行 append 操作: %s", {path: value for path, _, value in append_entries})
+        for path, parts, elements_to_add in append_entries:
+            current_list = get_by_tuple(content_config, parts)
 
             if current_list is None:
                 current_list = []
-                set_nested_value(content_config, path, current_list)
-                logger.debug(f"        路径 '{path}' 不存在，已创建新列表。")
+                set_by_tuple(content_config, parts, current_list)
+                logger.debug("        路径 '%s' 不存在，已创建新列表。", path)
             elif not isinstance(current_list, list):
                 logger.warning(f"        警告: 路径 '{path}' 的值不是列表，无法执行 append 操作。跳过。")
                 continue
 
             elements_to_add = elements_to_add if isinstance(elements_to_add, list) else [elements_to_add]
-            current_list.extend(elements_to_add)
-            logger.debug(f"        已向 '{path}' 列表末尾添加元素。")
+            current_list.extend(fast_clone(elements_to_add))
+            logger.debug("        已向 '%s' 列表末尾添加元素。", path)
 
 
     if 'prepend' in actions:
-        processed_prepend_map = process_placeholders(actions['prepend'], context)
-        logger.debug(f"    正在执行 prepend 操作: {processed_prepend_map}")
-        for path, elements_to_add in processed_prepend_map.items():
-            current_list = get_nested_value(content_config, path)
+        prepend_entries = compiled_actions.prepend
+        if prepend_entries is None:
+            prepend_entries = split_path_mapping(render_templates(compiled_actions.templates['prepend'], context))
+        if debug_enabled:
+            logger.debug("    正在执行 prepend 操作: %s", {path: value for path, _, value in prepend_entries})
+        for path, parts, elements_to_add in prepend_entries:
+            current_list = get_by_tuple(content_config, parts)
 
             if current_list is None:
                 current_list = []
-                set_nested_value(content_config, path, current_list)
-                logger.debug(f"        路径 '{path}' 不存在，已创建新列表。")
+                set_by_tuple(content_config, parts, current_list)
+                logger.debug("        路径 '%s' 不存在，已创建新列表。", path)
             elif not isinstance(current_list, list):
                 logger.warning(f"        警告: 路径 '{path}' 的值不是列表，无法执行 prepend 操作。跳过。")
                 continue
             
             elements_to_add = elements_to_add if isinstance(elements_to_add, list) else [elements_to_add]
-            current_list[:0] = elements_to_add
-            logger.debug(f"        已向 '{path}' 列表开头添加元素。")
+            current_list[:0] = fast_clone(elements_to_add)
+            logger.debug("        已向 '%s' 列表开头添加元素。", path)
 
 
     if 'sequence' in actions:
-        processed_sequence_map = process_placeholders(actions['sequence'], context)
-        logger.debug(f"    正在执行 sequence 操作: {processed_sequence_map}")
-        for path, sequence_info in processed_sequence_map.items():
-            
-            sequence_id = sequence_info.get('id')
-            
-            if sequence_id:
-                # 模式：共享。键是用户提供的 'id'。
-                counter_key = f"shared_id_{sequence_id}"
-                logger.debug(f"      序列 '{path}' 使用共享ID '{sequence_id}'。")
-            else:
-                # 模式：隔离 (默认)。键是规则名称和路径的组合。
-                if rule_name == 'Unnamed Rule':
-                    logger.error(f"      ✖️ 错误: 路径 '{path}' 的 sequence 操作位于一个未命名的规则中，并且没有提供 'id'。")
-                    logger.error(f"        为了确保序列不互相干扰，请为该规则命名或为 sequence 提供一个 'id'。")
+        if rule.sequences is not None:
+            logger.debug("    正在执行 sequence 操作: %s", actions['sequence'])
+            for sequence in rule.sequences:
+                if sequence.slot is None:
+                    _log_unnamed_sequence_error(sequence.path)
                     continue
-                counter_key = (rule_name, path)
-                logger.debug(f"      序列 '{path}' 在规则 '{rule_name}' 内是独立的。")
-
-            start_value = sequence_info.get('start', 0)
-            step_value = sequence_info.get('step', 1)
-            format_string = sequence_info.get('format')
-
-            if counter_key not in sequence_counters:
-                initial_value = start_value
-                override_key = sequence_id if sequence_id else path
-                if sequence_overrides and override_key in sequence_overrides:
-                    initial_value = sequence_overrides[override_key]
-                    logger.debug(f"      序列 '{override_key}' 的起始值被命令行覆盖为 {initial_value}")
-                sequence_counters[counter_key] = initial_value
-
-            current_value = sequence_counters[counter_key]
-            final_value_to_set = None
-
-            if format_string and isinstance(format_string, str):
-                final_value_to_set = format_string.replace('{counter}', str(current_value))
-                logger.debug(f"      字段 '{path}' 已使用格式 '{format_string}' 和上下文解析为 '{final_value_to_set}'")
-            else:
-                final_value_to_set = current_value
-                logger.debug(f"      字段 '{path}' 已设置为 {current_value} (下一次递增/减 {step_value})")
+                if sequence.sequence_id:
+                    logger.debug("      序列 '%s' 使用共享ID '%s'。", sequence.path, sequence.sequence_id)
+                else:
+                    logger.debug("      序列 '%s' 在规则 '%s' 内是独立的。", sequence.path, rule_name)
+                _apply_sequence(content_config, sequence.path, sequence.parts, sequence.slot, sequence.start, sequence.step,
+                                sequence.format, sequence.override_key, sequence_counters, sequence_overrides)
+        else:
+            processed_sequence_map = render_templates(compiled_actions.templates['sequence'], context)
+            logger.debug("    正在执行 sequence 操作: %s", processed_sequence_map)
+            for path, sequence_info in processed_sequence_map.items():
 
-            set_nested_value(content_config, path, final_value_to_set)
-            sequence_counters[counter_key] += step_value
-            
+                sequence_id = sequence_info.get('id')
+
+                if sequence_id:
+                    # 模式：共享。键是用户提供的 'id'。
+                    counter_key = f"shared_id_{sequence_id}"
+                    logger.debug("      序列 '%s' 使用共享ID '%s'。", path, sequence_id)
+                else:
+                    # 模式：隔离 (默认)。键是规则名称和路径的组合。
+                    if rule_name == 'Unnamed Rule':
+                        _log_unnamed_sequence_error(path)
+                        continue
+                    counter_key = (rule_name, path)
+                    logger.debug("      序列 '%s' 在规则 '%s' 内是独立的。", path, rule_name)
 
-def convert_single_file(old_config_path: str, rules_list: list, new_config_path: str, sequence_overrides: Dict[str, int] = None) -> Tuple[bool, Optional[dict]]:
+                _apply_sequence(content_config, path, split_path(path), sequence_counters.slot_for(counter_key),
+                                sequence_info.get('start', 0), sequence_info.get('step', 1), sequence_info.get('format'),
+                                sequence_id if sequence_id else path, sequence_counters, sequence_overrides)
+
+
+def _convert_item(content_type: str, content_id: Any, content_config_old: dict, top_level_rule: CompiledRule, sequence_counters: SequenceCounters, sequence_overrides: Optional[Dict[str, int]]) -> dict:
     """
-    转换单个 YAML 文件。
-    rules_list: 从 rules 文件中解析出来的整个 rules 列表
+    对单个内容项依次应用顶层规则中的所有子规则，返回转换后的配置。
+    """
+    logger.debug("--- 正在处理 '%s' 内容: %s ---", content_type, content_id)
+    content_config_new = fast_clone(content_config_old)
+    executed_rules_for_item = set()
+    # 条件查找过的 {路径: 值}，在多个规则的条件之间共享
+    resolved_paths = {}
+
+    # 1. 创建基础上下文
+    base_context = {
+        'content_id': content_id,
+        'content_type': content_type
+    }
+
+    # 2. 调用新函数处理用户定义的上下文 (大多数规则没有 context 块，直接使用基础上下文)
+    final_context = base_context
+    if top_level_rule.context_defs:
+        logger.debug("  正在处理用户定义的上下文...")
+        final_context = process_dynamic_context(top_level_rule.context_defs, content_config_new, base_context, logger)
+    logger.debug("  最终上下文: %s", final_context)
+
+    for rule in top_level_rule.nested_rules:
+        rule_name = rule.display_name
+
+        # 检查前置运行条件 (depends_on)
+        dependencies = rule.depends_on
+        if dependencies and not dependencies <= executed_rules_for_item:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("  > 规则 '%s' 的前置条件 %s 未满足，跳过此规则。",
+                             rule_name, dependencies - executed_rules_for_item)
+            continue
+
+        if rule.skip:
+            logger.debug("  > 规则 '%s' 的动作包含 'skip: true'，跳过此规则。", rule_name)
+            continue
+
+        logger.debug("  > 评估规则: '%s'", rule_name)
+        conditions_met = all(predicate(content_config_new, final_context, resolved_paths) for predicate in rule.predicates)
+
+        if conditions_met:
+            logger.debug("  > 规则 '%s' 的所有条件均满足，正在应用操作...", rule_name)
+            apply_actions(content_config_new, rule, final_context, sequence_counters, sequence_overrides)
+            # 动作可能修改了内容配置，之前查找到的路径值不再可靠
+            resolved_paths.clear()
+            # 增加检查，确保规则有名称时才添加
+            if rule.name:
+                executed_rules_for_item.add(rule.name)
+        else:
+            logger.debug("  > 规则 '%s' 的条件未满足，跳过此规则。", rule_name)
+
+    return content_config_new
+
+
+# 进度条最短刷新间隔 (秒)，刷新由 tqdm 在 update 时按该间隔节流
+PROGRESS_MININTERVAL = 0.2
+# 每处理多少个内容项更新一次进度条后缀中的当前内容 ID
+POSTFIX_UPDATE_EVERY = 64
+
+# 单个顶级键下的内容项数量达到该值时，才考虑在多个线程中转换
+PARALLEL_ITEM_THRESHOLD = 2000
+# 标准 CPython 中多线程无法同时执行 Python 代码，只在关闭 GIL 的自由线程构建中使用多线程转换
+_GIL_ENABLED = getattr(sys, '_is_gil_enabled', lambda: True)()
+
+
+def _item_thread_count(top_level_rule: CompiledRule, item_count: int) -> int:
+    """
+    计算转换某个顶级键下的内容项时使用的线程数，返回 1 表示按顺序转换。
+    sequence 动作是否推进计数器取决于每个内容项的条件，计数结果依赖处理顺序，因此包含 sequence 的规则始终按顺序转换。
+    """
+    if _GIL_ENABLED or top_level_rule.has_sequences or item_count < PARALLEL_ITEM_THRESHOLD:
+        return 1
+    return max(1, min(os.cpu_count() or 1, item_count // PARALLEL_ITEM_THRESHOLD))
+
+
+def _convert_items(content_type: str, contents_to_process: dict, top_level_rule: CompiledRule, sequence_counters: SequenceCounters, sequence_overrides: Optional[Dict[str, int]], pbar: tqdm) -> Iterator[Tuple[Any, dict]]:
+    """
+    依次转换某个顶级键下的所有内容项，逐个产出 (content_id, 转换后的配置)。
+    内容项足够多且可以多线程转换时，按块并行转换，产出顺序与原文件一致。
+    """
+    thread_count = _item_thread_count(top_level_rule, len(contents_to_process))
+    if thread_count > 1:
+        yield from _convert_items_threaded(content_type, contents_to_process, top_level_rule, sequence_overrides,
+                                           pbar, thread_count)
+        return
+
+    for index, (content_id, content_config_old) in enumerate(contents_to_process.items()):
+        # 单个内容项的处理通常远快于终端刷新，只需每隔若干项更新一次显示的当前内容
+        if index % POSTFIX_UPDATE_EVERY == 0:
+            pbar.set_postfix_str(f"当前: {content_id}", refresh=False)
+        yield content_id, _convert_item(content_type, content_id, content_config_old, top_level_rule,
+                                        sequence_counters, sequence_overrides)
+        pbar.update(1)
+
+
+def _convert_items_threaded(content_type: str, contents_to_process: dict, top_level_rule: CompiledRule, sequence_overrides: Optional[Dict[str, int]], pbar: tqdm, thread_count: int) -> Iterator[Tuple[Any, dict]]:
+    """
+    将内容项分块后在线程池中转换，按原顺序逐块产出结果。
+    调用方需保证规则中没有 sequence 动作，因此各线程之间不共享计数器。
+    """
+    items = list(contents_to_process.items())
+    chunk_size = -(-len(items) // thread_count)
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+    def convert_chunk(chunk: List[Tuple[Any, dict]]) -> List[Tuple[Any, dict]]:
+        # 没有 sequence 动作时计数器不会被访问，每个块使用独立的空计数器即可
+        counters = SequenceCounters({})
+        return [(content_id, _convert_item(content_type, content_id, content_config_old, top_level_rule,
+                                           counters, sequence_overrides))
+                for content_id, content_config_old in chunk]
+
+    with ThreadPoolExecutor(max_workers=thread_count) as executor:
+        for converted_chunk in executor.map(convert_chunk, chunks):
+            pbar.set_postfix_str(f"当前: {converted_chunk[-1][0]}", refresh=False)
+            yield from converted_chunk
+            pbar.update(len(converted_chunk))
+
+
+# 新建文件时的默认权限 (受 umask 限制)；mkstemp 创建的临时文件只对当前用户可读写，替换前需要恢复
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _output_file_mode(path: str) -> int:
+    """输出文件已存在时沿用其权限，否则使用与 open(path, 'w') 新建文件相同的权限。"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def _dump_yaml(data: Any) -> str:
+    return yaml.dump(data, Dumper=SafeDumper, indent=2, sort_keys=False, allow_unicode=True)
+
+
+def _write_converted_contents(f: TextIO, converted: Iterable[Tuple[str, Iterable[Tuple[Any, dict]]]]) -> None:
+    """
+    以流式方式写出转换结果，与一次性 yaml.dump 整个结果的输出一致。
+
+    每个内容项单独包装成 {content_key: {content_id: config}} 导出，这样它的缩进和
+    换行位置与整体导出时完全相同；同一顶级键下除第一项外，去掉重复的 `content_key:` 行。
+    内容项写出后即可被回收，无需在内存中保留完整的新配置。
+    逐项导出时锚点编号在每个内容项中从头开始，因此写入内容配置的值必须是独立的对象
+    (动作中的值和表达式结果均经过 fast_clone)，不能出现锚点和别名。
+    """
+    wrote_any = False
+    for content_key, items in converted:
+        first_item = True
+        for content_id, content_config in items:
+            text = _dump_yaml({content_key: {content_id: content_config}})
+            f.write(text if first_item else text.split('\n', 1)[1])
+            first_item = False
+        if first_item:
+            f.write(_dump_yaml({content_key: {}}))
+        wrote_any = True
+    if not wrote_any:
+        f.write(_dump_yaml({}))
+
+
+def _bucket_content_keys(old_data: dict, key_bases: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    按去掉末尾数字后的名称对顶级键分组，例如 'items' 和 'items2' 都归入 'items'。
+    每个顶层规则只需按 content_key_base 查找，而不必对所有顶级键逐一匹配。
+    只保留 key_bases 中的分组，没有规则处理的顶级键直接忽略。
+    """
+    buckets: Dict[str, List[str]] = {base: [] for base in key_bases}
+    for key in old_data:
+        if isinstance(key, str):
+            bucket = buckets.get(key.rstrip('0123456789'))
+            if bucket is not None:
+                bucket.append(key)
+    return buckets
+
+
+def convert_single_file(old_config_path: str, compiled_rules: CompiledRuleSet, new_config_path: str, sequence_overrides: Dict[str, int] = None, show_progress: bool = True) -> bool:
+    """
+    转换单个 YAML 文件。转换结果边生成边写入临时文件，全部转换成功后才替换输出文件，
+    转换中途出错时不会留下写了一半的输出文件。
+    compiled_rules: 由 compile_rules 编译得到的规则集
+    show_progress: 是否显示单文件进度条 (并行批量转换时关闭，避免多个进程的进度条互相覆盖)
+    返回是否转换成功。
     """
     logger.debug(f"加载中: 旧配置文件 '{old_config_path}'")
     try:
         with open(old_config_path, 'r', encoding='utf-8') as f:
-            old_data = yaml.safe_load(f)
+            old_data = yaml.load(f, Loader=SafeLoader)
     except FileNotFoundError:
         logger.error(f"✖️ 错误: 旧配置文件 '{old_config_path}' 未找到。")
-        return False, None
+        return False
     except yaml.YAMLError as e:
         logger.error(f"✖️ 错误: 解析旧配置文件 '{old_config_path}' 失败: {e}")
-        return False, None
+        return False
 
-    new_data = {}
-    sequence_counters = {}
+    sequence_counters = SequenceCounters(compiled_rules.sequence_slots)
+
+    # 每个顶层规则匹配到的顶级键只计算一次，供统计总数和实际转换共用
+    rules_by_key_base = compiled_rules.rules_by_key_base
+    content_key_buckets = _bucket_content_keys(old_data, rules_by_key_base)
 
     total_items = 0
-    for top_level_rule in rules_list:
-        content_type = top_level_rule.get('content')
-        if not content_type:
-            continue
-        content_key_base = f"{content_type}s" if not content_type.endswith('s') else content_type
-        matching_keys = [k for k in old_data if re.match(f"^{re.escape(content_key_base)}\d*$", k)]
-        for content_key in matching_keys:
-            total_items += len(old_data.get(content_key, {}))
-
-    with tqdm(total=total_items, 
-              desc=f"📦 {os.path.basename(old_config_path)}", 
-              unit=" item", 
-              colour="green", 
-              leave=False) as pbar:
-        for top_level_rule in rules_list:
-            content_type = top_level_rule.get('content')
-            nested_rules = top_level_rule.get('rules', [])
-            
-            dynamic_context_definitions = top_level_rule.get('context', {})
+    for key_base, rules_for_base in rules_by_key_base.items():
+        total_items += len(rules_for_base) * sum(len(old_data.get(k, {})) for k in content_key_buckets[key_base])
+
+    def converted_contents(pbar: tqdm) -> Iterator[Tuple[str, Iterator[Tuple[Any, dict]]]]:
+        for top_level_rule in compiled_rules.rules:
+            # 多个顶层规则匹配同一顶级键时，以最后一个规则的转换结果为准
+            is_final_rule = rules_by_key_base[top_level_rule.content_key_base][-1] is top_level_rule
+            for content_key in content_key_buckets[top_level_rule.content_key_base]:
+                contents_to_process = old_data.get(content_key, {}) or {}
+                items = _convert_items(top_level_rule.content_type, contents_to_process, top_level_rule,
+                                       sequence_counters, sequence_overrides, pbar)
+                if is_final_rule:
+                    yield content_key, items
+                else:
+                    # 结果会被后面的规则覆盖，但仍需执行以保持序列计数器的推进
+                    for _ in items:
+                        pass
 
-            if not content_type:
-                logger.warning(
-                    f"警告: 顶层规则 '{top_level_rule.get('name', 'Unnamed Top Rule')}' 缺少 'content' 字段，跳过。")
-                continue
+    logger.debug(f"保存中: 新配置文件 '{new_config_path}'")
+    temp_config_path = None
+    try:
+        # 临时文件使用唯一的文件名，不会覆盖或删除用户已有的文件
+        fd, temp_config_path = tempfile.mkstemp(prefix=f".{os.path.basename(new_config_path)}.", suffix='.tmp',
+                                                dir=os.path.dirname(new_config_path) or '.')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f, \
+                tqdm(total=total_items,
+                     desc=f"📦 {os.path.basename(old_config_path)}",
+                     unit=" item",
+                     colour="green",
+                     leave=False,
+                     mininterval=PROGRESS_MININTERVAL,
+                     disable=not show_progress) as pbar:
+            _write_converted_contents(f, converted_contents(pbar))
+        os.chmod(temp_config_path, _output_file_mode(new_config_path))
+        os.replace(temp_config_path, new_config_path)
+        temp_config_path = None
+        logger.debug(f"完成: 新配置文件 '{new_config_path}' 已成功保存。")
+        return True
+    except (IOError, yaml.YAMLError) as e:
+        logger.error(f"✖️ 错误: 保存新配置文件 '{new_config_path}' 失败: {e}")
+        return False
+    finally:
+        # 成功时临时文件已被重命名；失败 (包括规则动作抛出的其他异常) 时删除它
+        if temp_config_path is not None:
+            try:
+                os.remove(temp_config_path)
+            except OSError:
+                pass
 
-            content_key_base = f"{content_type}s" if not content_type.endswith('s') else content_type
-            matching_keys = [k for k in old_data if re.match(f"^{re.escape(content_key_base)}\d*$", k)]
 
-            if not matching_keys:
-                continue
+# 批量模式下每个工作进程持有的已编译规则，由 _init_batch_worker 在进程启动时设置一次
+_worker_rules_list: Optional[CompiledRuleSet] = None
 
-            for content_key in matching_keys:
-                contents_to_process = old_data.get(content_key, {})
-                if not contents_to_process:
-                    new_data[content_key] = {}
-                    continue
 
-                new_data[content_key] = {}
-
-                for content_id, content_config_old in contents_to_process.items():
-                    pbar.set_postfix_str(f"当前: {content_id}", refresh=True)
-                    
-                    logger.debug(f"--- 正在处理 '{content_type}' 内容: {content_id} ---")
-                    content_config_new = copy.deepcopy(content_config_old)
-                    executed_rules_for_item = set()
-                    
-                    # 1. 创建基础上下文
-                    base_context = {
-                        'content_id': content_id,
-                        'content_type': content_type
-                    }
-
-                    # 2. 调用新函数处理用户定义的上下文
-                    logger.debug(f"  正在处理用户定义的上下文...")
-                    final_context = process_dynamic_context(dynamic_context_definitions, content_config_new, base_context, logger)
-                    logger.debug(f"  最终上下文: {final_context}")
-
-                    for rule in nested_rules:
-                        rule_name = rule.get('name', 'Unnamed Rule')
-                        rule_actions = rule.get('actions', {})
-
-                        # 检查前置运行条件 (depends_on)
-                        dependencies = rule.get('depends_on')
-                        if dependencies:
-                            if isinstance(dependencies, str):
-                                dependencies = [dependencies]
-                            
-                            missing_deps = [dep for dep in dependencies if dep not in executed_rules_for_item]
-
-                            if missing_deps:
-                                logger.debug(f"  > 规则 '{rule_name}' 的前置条件 {missing_deps} 未满足，跳过此规则。")
-                                continue
-
-                        if rule_actions.get('skip', False):
-                            logger.debug(f"  > 规则 '{rule_name}' 的动作包含 'skip: true'，跳过此规则。")
-                            continue
-
-                        conditions_met = True
-                        logger.debug(f"  > 评估规则: '{rule_name}'")
-                        if 'conditions' in rule:
-                            for condition in rule['conditions']:
-                                # 修正了对 evaluate_condition 的调用，现在它是正确的
-                                if not evaluate_condition(content_config_new, condition, final_context, logger):
-                                    conditions_met = False
-                                    logger.debug(f"    规则 '{rule_name}' 的条件未满足，跳过。")
-                                    break
-
-                        if conditions_met:
-                            logger.debug(f"  > 规则 '{rule_name}' 的所有条件均满足，正在应用操作...")
-                            apply_actions(content_config_new, rule_actions, final_context, sequence_counters, rule_name, sequence_overrides)
-                            # 增加检查，确保规则有名称时才添加
-                            if rule.get('name'):
-                                executed_rules_for_item.add(rule.get('name'))
-                        else:
-                            logger.debug(f"  > 规则 '{rule_name}' 的条件未满足，跳过此规则。")
+def _init_batch_worker(rules_list: list, debug_mode: bool) -> None:
+    """
+    工作进程初始化函数：配置日志并在进程内编译一次规则，避免每个任务重复传输和编译规则。
+    """
+    global _worker_rules_list
+    setup_logging(debug_mode=debug_mode)
+    _worker_rules_list = compile_rules(rules_list)
 
-                    new_data[content_key][content_id] = content_config_new
-                    pbar.update(1)
 
-    logger.debug(f"保存中: 新配置文件 '{new_config_path}'")
-    try:
-        with open(new_config_path, 'w', encoding='utf-8') as f:
-            yaml.dump(new_data, f, indent=2, sort_keys=False, allow_unicode=True)
-        logger.debug(f"完成: 新配置文件 '{new_config_path}' 已成功保存。")
-        return True, new_data
-    except IOError as e:
-        logger.error(f"✖️ 错误: 保存新配置文件 '{new_config_path}' 失败: {e}")
-        return False, None
+def _convert_in_worker(conversions: List[Tuple[str, str]], sequence_overrides: Optional[Dict[str, int]]) -> List[bool]:
+    """
+    在工作进程中按顺序转换一组输出到同一路径的文件。仅返回每个文件是否成功，避免将转换结果回传给主进程。
+    """
+    return [convert_single_file(input_file, _worker_rules_list, output_file,
+                                sequence_overrides=sequence_overrides, show_progress=False)
+            for input_file, output_file in conversions]
 
 
-def convert_multiple_files(input_files: List[str], rules_config_path: str, output_dir: str, sequence_overrides: Dict[str, int] = None) -> None:
+def _group_by_output(tasks: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
     """
-    批量转换多个 YAML 文件。
+    按输出路径分组 (保持输入顺序)。不同目录下的同名文件会输出到同一路径，
+    同一组内的文件必须按顺序转换，以最后一个文件的结果为准，不能并行写入同一文件。
     """
-    logger.info(f"{Fore.CYAN}⚙️ 加载中: 转换规则 '{rules_config_path}'{Style.RESET_ALL}")
-    try:
-        with open(rules_config_path, 'r', encoding='utf-8') as f:
-            rules_config = yaml.safe_load(f)
-            if not isinstance(rules_config, dict) or 'rules' not in rules_config:
-                logger.error(f"✖️ 错误: 转换规则文件 '{rules_config_path}' 格式不正确，缺少 'rules' 键。")
-                return
-            rules_list = rules_config.get('rules', [])
-    except FileNotFoundError:
-        logger.error(f"✖️ 错误: 转换规则文件 '{rules_config_path}' 未找到。")
-        return
-    except yaml.YAMLError as e:
-        logger.error(f"✖️ 错误: 解析转换规则文件 '{rules_config_path}' 失败: {e}")
-        return
+    groups: Dict[str, List[Tuple[str, str]]] = {}
+    for input_file, output_file in tasks:
+        groups.setdefault(os.path.normcase(os.path.abspath(output_file)), []).append((input_file, output_file))
+    for conversions in groups.values():
+        if len(conversions) > 1:
+            logger.warning(f"多个输入文件输出到同一路径 '{conversions[0][1]}'，将按顺序转换，以最后一个文件的结果为准: "
+                           f"{[input_file for input_file, _ in conversions]}")
+    return list(groups.values())
 
+
+def convert_multiple_files(input_files: List[str], rules_list: list, output_dir: str, sequence_overrides: Dict[str, int] = None, jobs: Optional[int] = None) -> None:
+    """
+    批量转换多个 YAML 文件。
+    每个文件的序列计数器相互独立，因此文件之间可以在多个进程中并行转换；
+    输出到同一路径的文件 (不同目录下的同名文件) 在同一进程中按顺序转换。
+    rules_list: 已从规则文件中解析出来的 rules 列表 (由调用方加载并校验)
+    jobs: 并行进程数，默认为 CPU 核心数；为 1 时在当前进程中顺序转换。
+    """
     os.makedirs(output_dir, exist_ok=True)
 
     successful_conversions = 0
     total_files = len(input_files)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, total_files))
 
     logger.info(f"{Fore.GREEN}➜ 开始批量转换 {total_files} 个文件到 '{output_dir}'。{Style.RESET_ALL}")
 
-    with tqdm(total=total_files, desc="🚀 批量转换", unit="file", colour="cyan", leave=True) as pbar:
-        for input_file in input_files:
-            base_name = os.path.basename(input_file)
-            pbar.set_postfix_str(f"处理中: {base_name}", refresh=True)
-
-            output_file = os.path.join(output_dir, base_name)
-            if os.path.abspath(input_file) == os.path.abspath(output_file):
-                name, ext = os.path.splitext(base_name)
-                output_file = os.path.join(output_dir, f"{name}_converted{ext}")
+    tasks = []
+    for input_file in input_files:
+        base_name = os.path.basename(input_file)
+        output_file = os.path.join(output_dir, base_name)
+        if os.path.abspath(input_file) == os.path.abspath(output_file):
+            name, ext = os.path.splitext(base_name)
+            output_file = os.path.join(output_dir, f"{name}_converted{ext}")
+        tasks.append((input_file, output_file))
+
+    task_groups = _group_by_output(tasks)
+
+    with tqdm(total=total_files, desc="🚀 批量转换", unit="file", colour="cyan", leave=True,
+              mininterval=PROGRESS_MININTERVAL) as pbar:
+        if jobs == 1:
+            compiled_rules = compile_rules(rules_list)
+            for input_file, output_file in tasks:
+                base_name = os.path.basename(input_file)
+                pbar.set_postfix_str(f"处理中: {base_name}", refresh=False)
+
+                success = convert_single_file(input_file, compiled_rules, output_file, sequence_overrides=sequence_overrides)
+                if success:
+                    successful_conversions += 1
+                else:
+                    logger.error(f"✖️ 文件 '{base_name}' 转换失败。")
 
-            success, _ = convert_single_file(input_file, rules_list, output_file, sequence_overrides=sequence_overrides)
-            if success:
-                successful_conversions += 1
-            else:
-                logger.error(f"✖️ 文件 '{base_name}' 转换失败。")
+                pbar.update(1)
+        else:
+            logger.debug(f"使用 {jobs} 个进程并行转换。")
+            debug_mode = logger.isEnabledFor(logging.DEBUG)
+            with ProcessPoolExecutor(max_workers=jobs,
+                                     initializer=_init_batch_worker,
+                                     initargs=(rules_list, debug_mode)) as executor:
+                futures = {
+                    executor.submit(_convert_in_worker, conversions, sequence_overrides): conversions
+                    for conversions in task_groups
+                }
+                for future in as_completed(futures):
+                    conversions = futures[future]
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        for input_file, _ in conversions:
+                            logger.error(f"✖️ 文件 '{os.path.basename(input_file)}' 转换时工作进程出错: {e}")
+                        results = [False] * len(conversions)
+
+                    for (input_file, _), success in zip(conversions, results):
+                        base_name = os.path.basename(input_file)
+                        pbar.set_postfix_str(f"完成: {base_name}", refresh=False)
+                        if success:
+                            successful_conversions += 1
+                        else:
+                            logger.error(f"✖️ 文件 '{base_name}' 转换失败。")
 
-            pbar.update(1)
+                        pbar.update(1)
 
     logger.info(
-        f"{Fore.GREEN}🎉 批量转换完成。成功转换 {successful_conversions}/{total_files} 个文件。{Style.RESET_ALL}")
\ No newline at end of file
+        f"{Fore.GREEN}🎉 批量转换完成。成功转换 {successful_conversions}/{total_files} 个文件。{Style.RESET_ALL}")
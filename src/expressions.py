@@ -0,0 +1,153 @@
+import ast
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional, Union
+
+from asteval import Interpreter
+
+from src.utils import get_nested_value
+
+# 表达式中可用的辅助函数，见 RULES.md 的“表达式语法详解”
+EXPRESSION_HELPERS: Dict[str, Any] = {
+    "upper": str.upper,
+    "lower": str.lower,
+    "replace": lambda s, old, new: str(s).replace(old, new),
+    "split": lambda s, sep: str(s).split(sep),
+    "str": str,
+    "int": int,
+    "float": float,
+    "len": len,
+    "get": get_nested_value,
+}
+
+class _InterpreterState(threading.local):
+    """
+    每个线程只创建一次解释器；构建 Interpreter 及其符号表的开销远大于一次表达式求值。
+    解释器的符号表在求值时会被改写，因此不能在线程之间共享。
+    """
+    def __init__(self):
+        self.aeval = Interpreter(no_print=True)
+        self.aeval.symtable.update(EXPRESSION_HELPERS)
+        self.base_symbols = dict(self.aeval.symtable)
+        # 上一次求值时绑定的上下文变量名，下一次求值前需要清除，避免变量在内容项之间泄漏
+        self.bound_names = set()
+
+
+_state = _InterpreterState()
+
+
+@dataclass(slots=True)
+class CompiledExpression:
+    """
+    预先解析好的表达式。同一表达式会对每个内容项求值，只需解析一次。
+    """
+    source: str
+    node: Optional[Any]  # asteval 解析得到的 AST；语法错误时为 None
+    assigned_names: FrozenSet[str] = frozenset()  # 表达式中赋值或删除的变量名，求值后需要还原
+
+    def __repr__(self) -> str:
+        return repr(self.source)
+
+
+def compile_expression(expression: str) -> CompiledExpression:
+    """
+    使用共享解释器预先解析表达式。
+
+    Args:
+        expression (str): 规则文件中的表达式字符串。
+
+    Returns:
+        CompiledExpression: 解析结果。存在语法错误时不解析，求值时按原字符串处理，
+            以便与之前一样在每次求值时报告错误。
+    """
+    aeval = _state.aeval
+    try:
+        node = aeval.parse(expression)
+    except Exception:
+        node = None
+    aeval.error = []
+    if node is None:
+        return CompiledExpression(source=expression, node=None)
+    return CompiledExpression(source=expression, node=node, assigned_names=_assigned_names(node))
+
+
+def _assigned_names(node: Any) -> FrozenSet[str]:
+    """找出表达式中会改写解释器符号表的名称 (赋值、删除、循环变量、函数定义等)。"""
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Load):
+            names.add(child.id)
+        elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(child.name)
+        elif isinstance(child, ast.alias):
+            names.add((child.asname or child.name).split('.')[0])
+    return frozenset(names)
+
+
+def _restore_symbols(names: FrozenSet[str]) -> None:
+    """
+    撤销表达式对符号表的改写：新定义的变量被移除，被覆盖的内置符号恢复原值。
+    否则一个内容项中赋值的变量会在后续内容项和规则中可见，结果依赖处理顺序。
+    被覆盖的上下文变量会在下一次绑定时重新设置。
+    """
+    symtable = _state.aeval.symtable
+    base_symbols = _state.base_symbols
+    for name in names:
+        if name in base_symbols:
+            symtable[name] = base_symbols[name]
+        else:
+            symtable.pop(name, None)
+
+
+def _bind_symbols(content_config: dict, context: Dict[str, Any]) -> None:
+    """
+    将当前内容项与上下文绑定到共享解释器的符号表中。
+    上一次绑定的上下文变量会先被移除 (若覆盖了内置符号则恢复原值)。
+    """
+    state = _state
+    symtable = state.aeval.symtable
+    base_symbols = state.base_symbols
+    bound_names = state.bound_names
+    for name in bound_names:
+        if name in base_symbols:
+            symtable[name] = base_symbols[name]
+        else:
+            symtable.pop(name, None)
+    bound_names.clear()
+
+    symtable['data'] = content_config
+    symtable['context'] = context
+    symtable.update(context)
+    bound_names.update(context)
+
+
+def evaluate_expression(expression: Union[str, CompiledExpression], content_config: dict, context: Dict[str, Any]) -> Any:
+    """
+    使用共享的 asteval 解释器计算表达式。
+
+    Args:
+        expression (Union[str, CompiledExpression]): 表达式字符串，或由 compile_expression 预先解析的表达式。
+        content_config (dict): 当前内容项的配置，在表达式中以 `data` 访问。
+        context (Dict[str, Any]): 已解析的上下文变量，可在表达式中直接按名称访问，
+            也可以通过 `context['var']` 访问。
+
+    Returns:
+        any: 表达式的计算结果。
+    """
+    _bind_symbols(content_config, context)
+    aeval = _state.aeval
+    # 解释器会记录每次求值的代码，重复使用的解释器需要及时清理
+    aeval.code_text.clear()
+    if isinstance(expression, str):
+        # 运行时渲染了占位符的表达式，同样需要知道其中赋值的名称
+        expression = compile_expression(expression)
+    if not isinstance(expression, CompiledExpression):
+        return aeval.eval(expression)
+    if expression.node is None:
+        return aeval.eval(expression.source)
+    if not expression.assigned_names:
+        return aeval.eval(expression.node)
+    try:
+        return aeval.eval(expression.node)
+    finally:
+        _restore_symbols(expression.assigned_names)
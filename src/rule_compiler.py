@@ -0,0 +1,258 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.conditions import ConditionPredicate, compile_condition
+from src.expressions import compile_expression
+from src.utils import compile_templates, find_placeholder_names, split_path
+
+logger = logging.getLogger('YAMLConverter')
+
+# 每个内容项都可用的基础上下文变量
+BASE_CONTEXT_NAMES = frozenset(('content_id', 'content_type'))
+
+PathParts = Tuple[str, ...]
+
+
+def split_path_list(paths: Any) -> List[Tuple[str, PathParts]]:
+    """将路径列表 (例如 delete 动作) 转换为 [(路径, 拆分后的路径)]。"""
+    return [(path, split_path(path)) for path in paths]
+
+
+def split_path_mapping(mapping: Dict[str, Any]) -> List[Tuple[str, PathParts, Any]]:
+    """将 "路径: 值" 映射 (例如 set/append/prepend 动作) 转换为 [(路径, 拆分后的路径, 值)]。"""
+    return [(path, split_path(path), value) for path, value in mapping.items()]
+
+
+def split_rename_mapping(mapping: Dict[str, str]) -> List[Tuple[str, PathParts, str, PathParts]]:
+    """将 rename 动作的 "旧路径: 新路径" 映射转换为 [(旧路径, 拆分后的旧路径, 新路径, 拆分后的新路径)]。"""
+    return [(old_path, split_path(old_path), new_path, split_path(new_path)) for old_path, new_path in mapping.items()]
+
+
+@dataclass(slots=True)
+class CompiledActions:
+    """
+    不含上下文占位符的动作，路径已在编译时拆分为元组。
+    字段为 None 表示规则中没有该动作，或者该动作引用了上下文变量；
+    后者的占位符字符串已编译为 Template (见 templates)，在运行时渲染后再拆分路径。
+    """
+    delete: Optional[List[Tuple[str, PathParts]]] = None
+    rename: Optional[List[Tuple[str, PathParts, str, PathParts]]] = None
+    set: Optional[List[Tuple[str, PathParts, Any]]] = None
+    append: Optional[List[Tuple[str, PathParts, Any]]] = None
+    prepend: Optional[List[Tuple[str, PathParts, Any]]] = None
+    # 动作名 -> compile_templates 的结果，仅包含引用了上下文变量的动作 (包括 sequence)
+    templates: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class CompiledSequence:
+    """
+    不含上下文占位符的 sequence 动作项，计数器槽位在编译时分配。
+    """
+    path: str
+    parts: PathParts
+    sequence_id: Any  # 共享序列的 id，独立序列为 None
+    slot: Optional[int]  # 计数器槽位；未命名规则中的独立序列为 None (运行时报错)
+    start: Any
+    step: Any
+    format: Any
+    override_key: Any  # 命令行 --sequence-start 使用的键
+
+
+@dataclass(slots=True)
+class CompiledNestedRule:
+    """
+    预处理后的具体转换规则 (顶层规则中 `rules` 列表的一项)。
+    """
+    name: Optional[str]  # 规则文件中声明的名称，未命名时为 None
+    display_name: str  # 用于日志和隔离序列计数器的名称
+    actions: Dict[str, Any]
+    predicates: List[ConditionPredicate]  # 编译后的 conditions，全部满足时才执行动作
+    depends_on: frozenset  # 前置规则名称集合
+    skip: bool
+    compiled_actions: CompiledActions = field(default_factory=CompiledActions)
+    # 预先分配好槽位的 sequence 动作；为 None 时表示没有 sequence 动作或其中含有占位符，需要运行时解析
+    sequences: Optional[List[CompiledSequence]] = None
+
+
+@dataclass(slots=True)
+class CompiledRule:
+    """
+    预处理后的顶层规则 (内容规则集)。
+    """
+    name: str
+    content_type: str
+    content_key_base: str  # 例如 'item' -> 'items'，匹配 'items', 'items2' 等顶级键
+    context_defs: Dict[str, Any]  # 其中的表达式已由 compile_expression 预先解析
+    nested_rules: List[CompiledNestedRule] = field(default_factory=list)
+    # 是否有任何子规则包含 sequence 动作；序列计数器依赖内容项的处理顺序
+    has_sequences: bool = False
+
+
+@dataclass(slots=True)
+class CompiledRuleSet:
+    """
+    整个规则文件编译后的结果。
+    """
+    rules: List[CompiledRule]
+    # content_key_base -> 处理这些顶级键的顶层规则 (保持规则文件中的顺序)
+    rules_by_key_base: Dict[str, List[CompiledRule]] = field(default_factory=dict)
+    # 序列计数器键 -> 槽位。键的形式与运行时相同：共享序列为 'shared_id_<id>'，独立序列为 (规则名, 路径)
+    sequence_slots: Dict[Any, int] = field(default_factory=dict)
+
+
+def _compile_sequences(sequence_map: Any, rule_name: str, context_names: frozenset,
+                       sequence_slots: Dict[Any, int]) -> Optional[List[CompiledSequence]]:
+    """
+    为 sequence 动作预先分配计数器槽位。
+    只要其中引用了任何上下文变量 (路径、id 等可能随内容项变化)，就返回 None 交由运行时处理。
+    """
+    if not isinstance(sequence_map, dict):
+        return None
+    if find_placeholder_names(sequence_map) & context_names:
+        return None
+    if not all(isinstance(path, str) and isinstance(info, dict) for path, info in sequence_map.items()):
+        return None
+
+    sequences = []
+    for path, sequence_info in sequence_map.items():
+        sequence_id = sequence_info.get('id')
+        if sequence_id:
+            counter_key = f"shared_id_{sequence_id}"
+        elif rule_name == 'Unnamed Rule':
+            counter_key = None
+        else:
+            counter_key = (rule_name, path)
+
+        slot = None
+        if counter_key is not None:
+            slot = sequence_slots.setdefault(counter_key, len(sequence_slots))
+
+        sequences.append(CompiledSequence(
+            path=path,
+            parts=split_path(path),
+            sequence_id=sequence_id,
+            slot=slot,
+            start=sequence_info.get('start', 0),
+            step=sequence_info.get('step', 1),
+            format=sequence_info.get('format'),
+            override_key=sequence_id if sequence_id else path,
+        ))
+    return sequences
+
+
+def _compile_expression_values(mapping: Any, context_names: frozenset) -> Any:
+    """
+    预先解析 "名称: {expression: ...}" 映射 (set 动作、context 块) 中的表达式。
+    表达式中引用了上下文变量占位符时保持原样，运行时渲染占位符后再求值。
+    """
+    if not isinstance(mapping, dict):
+        return mapping
+    compiled = {}
+    for key, value_config in mapping.items():
+        if isinstance(value_config, dict) and isinstance(value_config.get('expression'), str) \
+                and find_placeholder_names(value_config['expression']).isdisjoint(context_names):
+            value_config = {**value_config, 'expression': compile_expression(value_config['expression'])}
+        compiled[key] = value_config
+    return compiled
+
+
+def _compile_actions(actions: Dict[str, Any], context_names: frozenset) -> CompiledActions:
+    """
+    预先拆分不含上下文占位符的动作中的路径。
+    """
+    def is_static(value: Any) -> bool:
+        return find_placeholder_names(value).isdisjoint(context_names)
+
+    def is_path_mapping(value: Any) -> bool:
+        return isinstance(value, dict) and all(isinstance(path, str) for path in value)
+
+    compiled = CompiledActions()
+    delete_paths = actions.get('delete')
+    if isinstance(delete_paths, list) and all(isinstance(path, str) for path in delete_paths) and is_static(delete_paths):
+        compiled.delete = split_path_list(delete_paths)
+
+    rename_map = actions.get('rename')
+    if is_path_mapping(rename_map) and all(isinstance(path, str) for path in rename_map.values()) and is_static(rename_map):
+        compiled.rename = split_rename_mapping(rename_map)
+
+    for action in ('set', 'append', 'prepend'):
+        mapping = actions.get(action)
+        if action == 'set':
+            mapping = _compile_expression_values(mapping, context_names)
+        if is_path_mapping(mapping) and is_static(mapping):
+            setattr(compiled, action, split_path_mapping(mapping))
+
+    for action in ('delete', 'rename', 'set', 'append', 'prepend', 'sequence'):
+        if action in actions and getattr(compiled, action, None) is None:
+            value = actions[action]
+            if action == 'set':
+                value = _compile_expression_values(value, context_names)
+            compiled.templates[action] = compile_templates(value, context_names)
+    return compiled
+
+
+def _compile_nested_rule(rule: dict, context_names: frozenset, sequence_slots: Dict[Any, int]) -> CompiledNestedRule:
+    name = rule.get('name')
+    display_name = name or 'Unnamed Rule'
+    actions = rule.get('actions') or {}
+
+    dependencies = rule.get('depends_on') or []
+    if isinstance(dependencies, str):
+        dependencies = [dependencies]
+
+    sequences = None
+    if 'sequence' in actions:
+        sequences = _compile_sequences(actions['sequence'], display_name, context_names, sequence_slots)
+
+    return CompiledNestedRule(
+        name=name,
+        display_name=display_name,
+        actions=actions,
+        predicates=[compile_condition(condition, context_names) for condition in rule.get('conditions') or []],
+        depends_on=frozenset(dependencies),
+        skip=bool(actions.get('skip', False)),
+        compiled_actions=_compile_actions(actions, context_names),
+        sequences=sequences,
+    )
+
+
+def compile_rules(rules_list: list) -> CompiledRuleSet:
+    """
+    将规则文件中的 rules 列表预处理为便于重复执行的结构。
+    规则只需在加载后编译一次，即可用于任意数量的输入文件。
+
+    Args:
+        rules_list (list): 从规则文件中解析出来的整个 rules 列表。
+
+    Returns:
+        CompiledRuleSet: 编译后的规则集。缺少 'content' 字段的顶层规则会被跳过。
+    """
+    compiled = []
+    sequence_slots = {}
+    for top_level_rule in rules_list:
+        content_type = top_level_rule.get('content')
+        if not content_type:
+            logger.warning(
+                f"警告: 顶层规则 '{top_level_rule.get('name', 'Unnamed Top Rule')}' 缺少 'content' 字段，跳过。")
+            continue
+
+        content_key_base = f"{content_type}s" if not content_type.endswith('s') else content_type
+        context_defs = top_level_rule.get('context') or {}
+        context_names = BASE_CONTEXT_NAMES.union(context_defs)
+        nested_rules = [_compile_nested_rule(rule, context_names, sequence_slots)
+                        for rule in top_level_rule.get('rules') or []]
+        compiled.append(CompiledRule(
+            name=top_level_rule.get('name', 'Unnamed Top Rule'),
+            content_type=content_type,
+            content_key_base=content_key_base,
+            # context 中的表达式不做占位符替换，全部可以预先解析
+            context_defs=_compile_expression_values(context_defs, frozenset()),
+            nested_rules=nested_rules,
+            has_sequences=any('sequence' in rule.actions for rule in nested_rules),
+        ))
+    rules_by_key_base: Dict[str, List[CompiledRule]] = {}
+    for rule in compiled:
+        rules_by_key_base.setdefault(rule.content_key_base, []).append(rule)
+    return CompiledRuleSet(rules=compiled, rules_by_key_base=rules_by_key_base, sequence_slots=sequence_slots)
@@ -1,28 +1,392 @@
 import re
-from typing import Any, Dict
+import sys
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 import yaml
 
+from src.yaml_loader import SafeLoader
+
 
 def process_placeholders(value: Any, context: Dict[str, Any]) -> Any:
     """
     递归处理值中的占位符，支持字符串、列表和字典。
+    结果中未发生变化的标量列表与原值共享，写入前需要复制。
     """
-    if isinstance(value, str):
-        processed_str = value
-        for key, val in context.items():
-            processed_str = processed_str.replace(f"{{{key}}}", str(val))
-        if processed_str != value:
-            try:
-                return yaml.safe_load(processed_str)
-            except yaml.YAMLError:
-                return processed_str
+    if isinstance(value, str) and '{' not in value:
+        return value
+    return _process_placeholders(value, _make_substitution(context))
+
+
+@lru_cache(maxsize=256)
+def _placeholder_pattern(keys: Tuple[str, ...]) -> re.Pattern:
+    """匹配任意一个 `{key}` 占位符的正则，按上下文变量名集合缓存。"""
+    return re.compile(r"\{(" + "|".join(map(re.escape, keys)) + r")\}")
+
+
+def _make_substitution(context: Dict[str, Any]) -> Callable[[str], str]:
+    """
+    为整个值构造一次替换函数，嵌套的列表和字典共用。
+    通常一次正则扫描即可完成所有替换；替换结果可能构成新的占位符时，结果依赖逐个替换的顺序，
+    此时按上下文顺序逐个替换。
+    """
+    replacements = {str(key): str(val) for key, val in context.items()}
+    if not replacements:
+        return lambda text: text
+
+    prepared = [(f"{{{key}}}", replacement) for key, replacement in replacements.items()]
+
+    def substitute_in_order(text: str) -> str:
+        for token, replacement in prepared:
+            if token in text:
+                text = text.replace(token, replacement)
+        return text
+
+    if any('{' in replacement or '}' in replacement for replacement in replacements.values()):
+        return substitute_in_order
+
+    pattern = _placeholder_pattern(tuple(replacements))
+    lookup = replacements.__getitem__
+
+    def substitute(text: str) -> str:
+        result = pattern.sub(lambda match: lookup(match.group(1)), text)
+        if '{' in result and pattern.search(result):
+            # 替换文本与字面量花括号拼成了新的占位符 (例如 "{{a}b}")
+            return substitute_in_order(text)
+        return result
+    return substitute
+
+
+@lru_cache(maxsize=4096)
+def _load_scalar(text: str) -> Any:
+    try:
+        return yaml.load(text, Loader=SafeLoader)
+    except yaml.YAMLError:
+        return text
+
+
+def _parse_scalar(text: str) -> Any:
+    """
+    将替换占位符后的字符串按 YAML 解析 (解析失败时保留字符串)。
+    同样的替换结果 (如 "true"、"42"、物品 ID) 会在每个内容项上重复出现，解析结果按字符串缓存；
+    解析为列表或字典时返回副本，避免调用方修改缓存中的对象。
+    """
+    result = _load_scalar(text)
+    if isinstance(result, (dict, list)):
+        return fast_clone(result)
+    return result
+
+
+_CONTAINER_TYPES = frozenset((list, dict))
+_PLAIN_SCALAR_TYPES = frozenset((int, float, bool, type(None)))
+
+
+def _process_placeholders(value: Any, substitute: Callable[[str], str]) -> Any:
+    """
+    用显式队列代替递归遍历列表和字典，每个节点不再需要一次函数调用。
+    容器按广度优先顺序创建并写回父容器的对应位置；同一字典中替换后出现重复的键时，
+    与字典推导式一样保留最后一个值。不含占位符的标量列表不复制，结果中与原值共享。
+    """
+    def process_str(text: str) -> Any:
+        if '{' not in text:
+            return text
+        processed_str = substitute(text)
+        if processed_str != text:
+            return _parse_scalar(processed_str)
+        return text
+
+    t = type(value)
+    if t is str or (t not in _CONTAINER_TYPES and isinstance(value, str)):
+        return process_str(value)
+    if t not in _CONTAINER_TYPES and not isinstance(value, (list, dict)):
         return value
+
+    root = [None]
+    # (父容器, 键或下标, 待处理的原始节点)
+    pending = deque(((root, 0, value),))
+    while pending:
+        target, slot, node = pending.popleft()
+        t = type(node)
+        # 配置数据均为 YAML 加载得到的普通类型，先按类型精确匹配，子类再由 isinstance 兜底
+        if t is list and all(type(item) in _PLAIN_SCALAR_TYPES or (type(item) is str and '{' not in item)
+                             for item in node):
+            # 只含数字、布尔值和不含占位符的字符串的列表不会被改变，直接共享原列表
+            result = node
+        elif t is list or (t is not dict and isinstance(node, list)):
+            result = [None] * len(node)
+            for i, item in enumerate(node):
+                t = type(item)
+                if t is str:
+                    result[i] = process_str(item)
+                elif t in _PLAIN_SCALAR_TYPES:
+                    result[i] = item
+                elif t in _CONTAINER_TYPES or isinstance(item, (list, dict)):
+                    pending.append((result, i, item))
+                else:
+                    result[i] = process_str(item) if isinstance(item, str) else item
+        elif t is dict or isinstance(node, dict):
+            result = {}
+            # 键 (如 path、value、min) 通常不含占位符，此时无需处理，也不会出现重复的键
+            plain_keys = all(type(k) is str and '{' not in k for k in node)
+            for k, v in node.items():
+                if not plain_keys and isinstance(k, str):
+                    k = process_str(k)
+                t = type(v)
+                if not plain_keys and k in result:
+                    # 替换后出现重复的键：排队处理，保证按原顺序写入，后出现的值覆盖先出现的值
+                    pending.append((result, k, v))
+                elif t is str:
+                    result[k] = process_str(v)
+                elif t in _PLAIN_SCALAR_TYPES:
+                    result[k] = v
+                elif t in _CONTAINER_TYPES or isinstance(v, (list, dict)):
+                    result[k] = None
+                    pending.append((result, k, v))
+                else:
+                    result[k] = process_str(v) if isinstance(v, str) else v
+        else:
+            result = process_str(node) if isinstance(node, str) else node
+        target[slot] = result
+    return root[0]
+
+
+_PLACEHOLDER_NAME_RE = re.compile(r"\{([^{}]*)\}")
+
+
+def _collect_placeholder_names(value: Any, names: set) -> None:
+    if isinstance(value, str):
+        names.update(_PLACEHOLDER_NAME_RE.findall(value))
     elif isinstance(value, list):
-        return [process_placeholders(item, context) for item in value]
+        for item in value:
+            _collect_placeholder_names(item, names)
     elif isinstance(value, dict):
-        return {process_placeholders(k, context): process_placeholders(v, context) for k, v in value.items()}
+        for k, v in value.items():
+            _collect_placeholder_names(k, names)
+            _collect_placeholder_names(v, names)
+
+
+def find_placeholder_names(value: Any) -> set:
+    """
+    找出值 (字符串、列表或字典，包括字典的键) 中所有形如 `{name}` 的占位符名称。
+
+    Args:
+        value (any): 要检查的值。
+
+    Returns:
+        set: 占位符名称集合。
+    """
+    names = set()
+    _collect_placeholder_names(value, names)
+    return names
+
+
+class Template:
+    """
+    预编译的占位符字符串，例如 "A {rarity} item"。
+
+    编译时将字符串拆分为字面量与占位符名称，渲染时只需按名称查找上下文并拼接一次。
+    替换值含花括号，或拼接结果与字面量花括号构成了新的占位符时，结果依赖逐个替换的顺序，
+    交由 process_placeholders 处理，因此结果与其完全一致 (包括替换后按 YAML 解析标量)。
+    """
+    __slots__ = ('source', 'literals', 'names')
+
+    def __init__(self, source: str):
+        pieces = _PLACEHOLDER_NAME_RE.split(source)
+        self.source = source
+        self.literals = pieces[0::2]  # 比 names 多一项
+        self.names = pieces[1::2]
+
+    def render(self, context: Dict[str, Any], replacements: Optional[Dict[str, str]] = None) -> Any:
+        """
+        Args:
+            context (Dict[str, Any]): 上下文变量。
+            replacements (Dict[str, str], optional): 变量名 -> str(值) 的缓存，
+                同一次 render_templates 中的多个 Template 共用，每个变量只转换一次字符串。
+        """
+        literals = self.literals
+        pieces = [literals[0]]
+        for i, name in enumerate(self.names):
+            if name in context:
+                if replacements is None:
+                    replacement = str(context[name])
+                else:
+                    replacement = replacements.get(name)
+                    if replacement is None:
+                        replacement = replacements[name] = str(context[name])
+                if '{' in replacement or '}' in replacement:
+                    # 替换值本身可能构成新的占位符，此时结果依赖逐个替换的顺序，交由 process_placeholders 处理
+                    return process_placeholders(self.source, context)
+                pieces.append(replacement)
+            else:
+                pieces.append('{' + name + '}')
+            pieces.append(literals[i + 1])
+
+        rendered = ''.join(pieces)
+        if '{' in rendered and any(name in context for name in _PLACEHOLDER_NAME_RE.findall(rendered)):
+            # 替换文本与字面量花括号拼成了新的占位符 (例如 "{{content_id}}")
+            return process_placeholders(self.source, context)
+        if rendered == self.source:
+            return self.source
+        return _parse_scalar(rendered)
+
+    def __repr__(self) -> str:
+        return f"Template({self.source!r})"
+
+
+class TemplatedDict(dict):
+    """包含 Template 的字典 (键或值)，由 compile_templates 生成。"""
+
+
+class TemplatedList(list):
+    """包含 Template 的列表，由 compile_templates 生成。"""
+
+
+_TEMPLATED_TYPES = (Template, TemplatedDict, TemplatedList)
+
+
+def compile_templates(value: Any, names: Iterable[str]) -> Any:
+    """
+    将值中引用了给定上下文变量的字符串编译为 Template。
+
+    只有包含 Template 的容器会被重建为 TemplatedDict / TemplatedList，
+    其余部分原样保留，渲染时直接共享。
+
+    Args:
+        value (any): 规则中的值 (字符串、列表或字典，字典的键也会被处理)。
+        names (Iterable[str]): 可能出现在上下文中的变量名。
+
+    Returns:
+        any: 编译后的值，用 render_templates 渲染。
+    """
+    names = frozenset(names)
+    return _compile_templates(value, names)
+
+
+def _compile_templates(value: Any, names: frozenset) -> Any:
+    t = type(value)
+    if t is str:
+        if '{' in value and not names.isdisjoint(_PLACEHOLDER_NAME_RE.findall(value)):
+            return Template(value)
+        return value
+    if t is list:
+        items = [_compile_templates(item, names) for item in value]
+        if any(type(item) in _TEMPLATED_TYPES for item in items):
+            return TemplatedList(items)
+        return value
+    if t is dict:
+        items = [(_compile_templates(k, names), _compile_templates(v, names)) for k, v in value.items()]
+        if any(type(k) in _TEMPLATED_TYPES or type(v) in _TEMPLATED_TYPES for k, v in items):
+            return TemplatedDict(items)
+        return value
+    return value
+
+
+def render_templates(value: Any, context: Dict[str, Any]) -> Any:
+    """
+    使用上下文渲染 compile_templates 的结果，等价于对原始值调用 process_placeholders。
+    不含占位符的部分与规则共享，写入内容配置前需要复制 (fast_clone)。
+    """
+    t = type(value)
+    if t is Template:
+        return value.render(context)
+    if t is TemplatedDict or t is TemplatedList:
+        return _render_templates(value, context, {})
+    return value
+
+
+def _render_templates(value: Any, context: Dict[str, Any], replacements: Dict[str, str]) -> Any:
+    t = type(value)
+    if t is Template:
+        return value.render(context, replacements)
+    if t is TemplatedDict:
+        return {_render_templates(k, context, replacements): _render_templates(v, context, replacements)
+                for k, v in value.items()}
+    if t is TemplatedList:
+        return [_render_templates(item, context, replacements) for item in value]
+    return value
+
+
+def fast_clone(value: Any) -> Any:
+    """
+    复制由 YAML 加载得到的纯数据结构 (dict / list / 标量)。
+    比 copy.deepcopy 快得多：不维护 memo 字典，也不做通用的类型分派。
+    标量 (str, int, float, bool, None, 日期等) 不可变，直接共享。
+
+    Args:
+        value (any): 要复制的数据。
+
+    Returns:
+        any: 复制后的数据，dict 和 list 均为新对象。
+    """
+    t = type(value)
+    if t is dict:
+        return {k: fast_clone(v) for k, v in value.items()}
+    if t is list:
+        return [fast_clone(v) for v in value]
     return value
 
+@lru_cache(maxsize=1024)
+def split_path(path: str) -> Tuple[str, ...]:
+    """
+    将点分隔的路径拆分为键元组，例如 "behavior.block.state" -> ('behavior', 'block', 'state')。
+    规则中的静态路径在编译时拆分一次，之后使用 *_by_tuple 系列函数直接访问；
+    运行时才确定的路径 (渲染占位符后的路径、get_nested_value 等) 反复出现，拆分结果按路径缓存。
+    各级键名经过 sys.intern，所有规则共用同一个字符串对象，字典查找时可直接按对象比较。
+    """
+    return tuple(sys.intern(part) for part in path.split('.'))
+
+# 路径查找中表示“键不存在”的哨兵对象
+_MISS = object()
+
+
+def get_by_tuple(data: dict, parts: Tuple[str, ...]) -> Any:
+    """
+    根据已拆分的路径获取嵌套字典中的值，路径不存在时返回 None。
+    """
+    current = data
+    for part in parts:
+        # 内容配置均为 YAML 加载或 fast_clone 得到的普通 dict，用 type() is 代替 isinstance
+        if type(current) is not dict:
+            return None
+        current = current.get(part, _MISS)
+        if current is _MISS:
+            return None
+    return current
+
+def set_by_tuple(data: dict, parts: Tuple[str, ...], value: Any) -> None:
+    """
+    根据已拆分的路径设置或创建嵌套字典中的值，缺失的中间层级会自动创建为字典。
+    """
+    if not parts:
+        return
+    *head, tail = parts
+    current = data
+    for part in head: # 中间层级，确保是字典
+        nxt = current.get(part)
+        if type(nxt) is not dict:
+            nxt = {} # 如果不存在或不是字典，则创建一个新字典
+            current[part] = nxt
+        current = nxt
+    current[tail] = value # 最后一个部分是我们要设置的键
+
+def delete_by_tuple(data: dict, parts: Tuple[str, ...]) -> None:
+    """
+    根据已拆分的路径删除嵌套字典中的值，路径不存在时不会引发错误。
+    """
+    if not parts:
+        return
+    *head, tail = parts
+    parent = data
+    # 先找到最后一个键所在的字典，再删除该键
+    for part in head:
+        if type(parent) is not dict:
+            return # 路径不存在，无需删除
+        parent = parent.get(part, _MISS)
+        if parent is _MISS:
+            return
+    if type(parent) is dict:
+        parent.pop(tail, None) # 删除成功或键不存在
+
 def get_nested_value(data: dict, path: str) -> Any:
     """
     根据点分隔的路径获取嵌套字典中的值。
@@ -34,13 +398,53 @@ def get_nested_value(data: dict, path: str) -> Any:
     Returns:
         any: 路径对应的值，如果路径不存在则返回 None。
     """
-    parts = path.split('.')
+    # 与条件和动作的路径查找共用 get_by_tuple，拆分结果由 split_path 按路径缓存
+    return get_by_tuple(data, split_path(path))
+
+@lru_cache(maxsize=1024)
+def _path_prefixes(path: str) -> Tuple[Tuple[str, str], ...]:
+    """
+    路径的各级前缀及对应的键，例如 "a.b.c" -> (('a', 'a'), ('a.b', 'b'), ('a.b.c', 'c'))。
+    """
+    parts = split_path(path)
+    return tuple(('.'.join(parts[:i + 1]), part) for i, part in enumerate(parts))
+
+
+def resolve_path(data: dict, path: str, resolution_cache: Optional[dict] = None, parts: Optional[Tuple[str, ...]] = None) -> Any:
+    """
+    获取路径对应的值，并记录在 resolution_cache 中。
+    同一内容项的多个条件常常检查同一路径或共享路径前缀 (例如 behavior.block.state.*)：
+    查找时从最深的已缓存前缀继续，并缓存沿途的每一级前缀，共享的前缀只需遍历一次。
+    内容配置被修改 (执行动作) 后，调用方需要清空缓存。
+
+    Args:
+        data (dict): 要查询的字典。
+        path (str): 点分隔的路径字符串，同时作为缓存键。
+        resolution_cache (dict, optional): {路径: 值} 缓存，为 None 时不使用缓存。
+        parts (Tuple[str, ...], optional): 已拆分的路径，省略时由 split_path 拆分。
+
+    Returns:
+        any: 路径对应的值，如果路径不存在则返回 None。
+    """
+    if resolution_cache is None:
+        return get_by_tuple(data, parts if parts is not None else split_path(path))
+    value = resolution_cache.get(path, _MISS)
+    if value is not _MISS:
+        return value
+
+    prefixes = _path_prefixes(path)
+    start = 0
     current = data
-    for part in parts:
-        if isinstance(current, dict) and part in current:
-            current = current[part]
-        else:
-            return None
+    for i in range(len(prefixes) - 2, -1, -1):
+        cached = resolution_cache.get(prefixes[i][0], _MISS)
+        if cached is not _MISS:
+            start = i + 1
+            current = cached
+            break
+    # 与 get_by_tuple 一致：任何一级不是字典或键不存在时结果为 None
+    for prefix, part in prefixes[start:]:
+        current = current.get(part) if type(current) is dict else None
+        resolution_cache[prefix] = current
     return current
 
 def set_nested_value(data: dict, path: str, value: Any) -> None:
@@ -53,15 +457,7 @@ def set_nested_value(data: dict, path: str, value: Any) -> None:
         path (str): 点分隔的路径字符串。
         value (any): 要设置的值。
     """
-    parts = path.split('.')
-    current = data
-    for i, part in enumerate(parts):
-        if i == len(parts) - 1: # 最后一个部分是我们要设置的键
-            current[part] = value
-        else: # 中间层级，确保是字典
-            if part not in current or not isinstance(current[part], dict):
-                current[part] = {} # 如果不存在或不是字典，则创建一个新字典
-            current = current[part]
+    set_by_tuple(data, split_path(path), value)
 
 def delete_nested_value(data: dict, path: str) -> None:
     """
@@ -72,21 +468,45 @@ def delete_nested_value(data: dict, path: str) -> None:
         data (dict): 要修改的字典。
         path (str): 点分隔的路径字符串。
     """
-    parts = path.split('.')
-    current = data
-    # 遍历到倒数第二个部分，以便能够删除最后一个键
-    for i, part in enumerate(parts):
-        if i == len(parts) - 1:
-            if isinstance(current, dict) and part in current:
-                del current[part]
-            return # 删除成功或路径不存在，直接返回
-        else:
-            if isinstance(current, dict) and part in current:
-                current = current[part]
-            else:
-                return # 路径不存在，无需删除
+    delete_by_tuple(data, split_path(path))
+
+@lru_cache(maxsize=256)
+def compile_regex(pattern: str) -> re.Pattern:
+    """编译条件中 regex_match 使用的正则，按模式字符串缓存。"""
+    return re.compile(pattern)
+
+
+# id(值) -> (值, 是否含有 '{')。同时保存值本身，保证其存活期间 id 不会被复用
+_placeholder_flags: Dict[int, Tuple[Any, bool]] = {}
+_PLACEHOLDER_FLAGS_MAX = 4096
+
+
+def _contains_brace(value: Any) -> bool:
+    if isinstance(value, str):
+        return '{' in value
+    if isinstance(value, list):
+        return any(_contains_brace(item) for item in value)
+    if isinstance(value, dict):
+        return any(_contains_brace(k) or _contains_brace(v) for k, v in value.items())
+    return False
+
+
+def _has_placeholder(value: Any) -> bool:
+    """
+    检查值 (包括嵌套的列表、字典及字典的键) 中是否可能含有占位符。
+    规则中的条件会对每个内容项重复检查，结果按对象缓存。
+    """
+    cached = _placeholder_flags.get(id(value))
+    if cached is not None and cached[0] is value:
+        return cached[1]
+    flag = _contains_brace(value)
+    if len(_placeholder_flags) >= _PLACEHOLDER_FLAGS_MAX:
+        _placeholder_flags.clear()
+    _placeholder_flags[id(value)] = (value, flag)
+    return flag
+
 
-def evaluate_condition(item_config: dict, condition: dict, context: dict, current_logger) -> bool:
+def evaluate_condition(item_config: dict, condition: dict, context: dict, current_logger, resolution_cache: Optional[dict] = None) -> bool:
     """
     评估单个转换规则条件。
 
@@ -95,66 +515,67 @@ def evaluate_condition(item_config: dict, condition: dict, context: dict, curren
         condition (dict): 单个条件规则字典 (可能包含占位符)。
         context (dict): 包含额外上下文信息的字典，用于解析占位符。
         current_logger (logging.Logger): 用于日志输出的logger实例。
+        resolution_cache (dict, optional): 当前内容项的 {路径: 值} 缓存，见 resolve_path。
 
     Returns:
         bool: 如果条件满足则返回 True，否则返回 False。
     """
-    # 首先，使用上下文处理条件中的占位符
-    processed_condition = process_placeholders(condition, context)
+    # 首先，使用上下文处理条件中的占位符 (不含占位符的条件直接使用，无需重建字典)
+    processed_condition = process_placeholders(condition, context) if _has_placeholder(condition) else condition
 
     path = processed_condition.get('path')
     if not path:
         current_logger.warning(f"规则中的条件缺少 'path' 字段: {processed_condition}")
         return False
 
-    value_at_path = get_nested_value(item_config, path)
-    current_logger.debug(f"  - 评估条件 '{path}': 当前值 '{value_at_path}'")
+    value_at_path = resolve_path(item_config, path, resolution_cache)
+    current_logger.debug("  - 评估条件 '%s': 当前值 '%s'", path, value_at_path)
 
     # 1. 检查 'exists' (字段是否存在)
     if 'exists' in processed_condition:
         if processed_condition['exists'] is True and value_at_path is None:
-            current_logger.debug(f"    - 条件 '{path}' exists: True 未满足 (值为 None)")
+            current_logger.debug("    - 条件 '%s' exists: True 未满足 (值为 None)", path)
             return False
         if processed_condition['exists'] is False and value_at_path is not None:
-            current_logger.debug(f"    - 条件 '{path}' exists: False 未满足 (值不为 None)")
+            current_logger.debug("    - 条件 '%s' exists: False 未满足 (值不为 None)", path)
             return False
-        current_logger.debug(f"    - 条件 '{path}' exists: {processed_condition['exists']} 满足")
+        current_logger.debug("    - 条件 '%s' exists: %s 满足", path, processed_condition['exists'])
 
     # 如果字段不存在，并且条件要求检查值、正则表达式或范围，则不满足
     # 但如果 exists: False 已经匹配，则此处不应阻断
     if value_at_path is None and ('value' in processed_condition or 'regex_match' in processed_condition or 'min' in processed_condition or 'max' in processed_condition):
-        current_logger.debug(f"    - 条件 '{path}' 要求检查值但路径不存在。")
+        current_logger.debug("    - 条件 '%s' 要求检查值但路径不存在。", path)
         return False
 
 
     # 2. 检查 'value' (字段值是否相等)
     if 'value' in processed_condition:
         if value_at_path != processed_condition['value']:
-            current_logger.debug(f"    - 条件 '{path}' value: '{processed_condition['value']}' 未满足 (实际值: '{value_at_path}')")
+            current_logger.debug("    - 条件 '%s' value: '%s' 未满足 (实际值: '%s')", path, processed_condition['value'], value_at_path)
             return False
-        current_logger.debug(f"    - 条件 '{path}' value: '{processed_condition['value']}' 满足")
+        current_logger.debug("    - 条件 '%s' value: '%s' 满足", path, processed_condition['value'])
 
     # 3. 检查 'regex_match' (正则表达式匹配)
     if 'regex_match' in processed_condition:
         if not isinstance(value_at_path, str):
-            current_logger.debug(f"    - 条件 '{path}' regex_match 未满足 (值不是字符串: {type(value_at_path)})")
+            current_logger.debug("    - 条件 '%s' regex_match 未满足 (值不是字符串: %s)", path, type(value_at_path))
             return False # 只有字符串才能进行正则表达式匹配
-        if not re.match(processed_condition['regex_match'], value_at_path):
-            current_logger.debug(f"    - 条件 '{path}' regex_match: '{processed_condition['regex_match']}' 未满足 (实际值: '{value_at_path}')")
+        if not compile_regex(processed_condition['regex_match']).match(value_at_path):
+            current_logger.debug("    - 条件 '%s' regex_match: '%s' 未满足 (实际值: '%s')", path, processed_condition['regex_match'], value_at_path)
             return False
-        current_logger.debug(f"    - 条件 '{path}' regex_match: '{processed_condition['regex_match']}' 满足")
+        current_logger.debug("    - 条件 '%s' regex_match: '%s' 满足", path, processed_condition['regex_match'])
 
     # 4. 检查 'min'/'max' (数字范围)
     if 'min' in processed_condition or 'max' in processed_condition:
         if not isinstance(value_at_path, (int, float)):
-            current_logger.debug(f"    - 条件 '{path}' min/max 未满足 (值不是数字: {type(value_at_path)})")
+            current_logger.debug("    - 条件 '%s' min/max 未满足 (值不是数字: %s)", path, type(value_at_path))
             return False # 只有数字才能进行范围检查
         if 'min' in processed_condition and value_at_path < processed_condition['min']:
-            current_logger.debug(f"    - 条件 '{path}' min: '{processed_condition['min']}' 未满足 (实际值: '{value_at_path}')")
+            current_logger.debug("    - 条件 '%s' min: '%s' 未满足 (实际值: '%s')", path, processed_condition['min'], value_at_path)
             return False
         if 'max' in processed_condition and value_at_path > processed_condition['max']:
-            current_logger.debug(f"    - 条件 '{path}' max: '{processed_condition['max']}' 未满足 (实际值: '{value_at_path}')")
+            current_logger.debug("    - 条件 '%s' max: '%s' 未满足 (实际值: '%s')", path, processed_condition['max'], value_at_path)
             return False
-        current_logger.debug(f"    - 条件 '{path}' min/max 满足")
+        current_logger.debug("    - 条件 '%s' min/max 满足", path)
 
     return True # 所有检查都通过
\ No newline at end of file
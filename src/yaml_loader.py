@@ -0,0 +1,14 @@
+"""
+YAML 加载/导出后端选择。
+
+优先使用 LibYAML 提供的 C 实现 (CSafeLoader / CSafeDumper)，
+在 PyYAML 未编译 LibYAML 扩展时回退到纯 Python 实现。
+"""
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:  # PyYAML 未附带 LibYAML 绑定
+    from yaml import SafeLoader, SafeDumper
+
+__all__ = ["SafeLoader", "SafeDumper"]
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+
+import yaml
+
+from src.converter import _group_by_output, convert_multiple_files, convert_single_file
+from src.rule_compiler import compile_rules
+
+
+def _compile(rules_yaml: str):
+    return compile_rules(yaml.safe_load(rules_yaml)['rules'])
+
+
+class ConvertSingleFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.temp_dir.name, name)
+
+    def write(self, name: str, text: str) -> str:
+        with open(self.path(name), 'w', encoding='utf-8') as f:
+            f.write(text)
+        return self.path(name)
+
+    def test_expression_result_referencing_item_is_reloadable(self):
+        # data['stats'] 返回内容配置中的对象本身；每个内容项都写出这样的值时，输出仍需能被重新加载
+        rules = _compile("""
+rules:
+  - content: item
+    rules:
+      - name: copy
+        actions:
+          set:
+            stats_copy: {expression: "data['stats']"}
+""")
+        input_path = self.write('in.yml', """
+items:
+  a: {stats: {hp: 1}}
+  b: {stats: {hp: 2}}
+""")
+        output_path = self.path('out.yml')
+        self.assertTrue(convert_single_file(input_path, rules, output_path, show_progress=False))
+
+        with open(output_path, encoding='utf-8') as f:
+            converted = yaml.safe_load(f)
+        self.assertEqual(converted, {'items': {
+            'a': {'stats': {'hp': 1}, 'stats_copy': {'hp': 1}},
+            'b': {'stats': {'hp': 2}, 'stats_copy': {'hp': 2}},
+        }})
+
+    def test_existing_tmp_file_is_left_alone(self):
+        rules = _compile(COPY_ID_RULES)
+        input_path = self.write('in.yml', "items:\n  a: {}\n")
+        user_file = self.write('out.yml.tmp', "keep me\n")
+        self.assertTrue(convert_single_file(input_path, rules, self.path('out.yml'), show_progress=False))
+
+        with open(user_file, encoding='utf-8') as f:
+            self.assertEqual(f.read(), "keep me\n")
+        self.assertEqual(sorted(os.listdir(self.temp_dir.name)), ['in.yml', 'out.yml', 'out.yml.tmp'])
+
+
+COPY_ID_RULES = """
+rules:
+  - content: item
+    rules:
+      - name: mark
+        actions:
+          set:
+            source: "{content_id}"
+"""
+
+
+class ConvertMultipleFilesTest(unittest.TestCase):
+
+    def test_group_by_output_keeps_input_order(self):
+        tasks = [('x/a.yml', 'out/a.yml'), ('x/b.yml', 'out/b.yml'), ('y/a.yml', 'out/a.yml')]
+        self.assertEqual(_group_by_output(tasks),
+                         [[('x/a.yml', 'out/a.yml'), ('y/a.yml', 'out/a.yml')], [('x/b.yml', 'out/b.yml')]])
+
+    def test_same_basename_in_parallel_keeps_last_file(self):
+        # 不同目录下的同名文件输出到同一路径：与顺序转换一样以最后一个文件为准，且输出不会混杂
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_files = []
+            for directory, ids in (('x', ['x1', 'x2']), ('y', ['y1'])):
+                os.makedirs(os.path.join(temp_dir, directory))
+                input_file = os.path.join(temp_dir, directory, 'a.yml')
+                with open(input_file, 'w', encoding='utf-8') as f:
+                    yaml.safe_dump({'items': {content_id: {} for content_id in ids}}, f)
+                input_files.append(input_file)
+            input_files.append(os.path.join(temp_dir, 'x', 'b.yml'))
+            with open(input_files[-1], 'w', encoding='utf-8') as f:
+                yaml.safe_dump({'items': {'b1': {}}}, f)
+
+            output_dir = os.path.join(temp_dir, 'out')
+            rules_list = yaml.safe_load(COPY_ID_RULES)['rules']
+            convert_multiple_files(input_files, rules_list, output_dir, jobs=2)
+
+            self.assertEqual(sorted(os.listdir(output_dir)), ['a.yml', 'b.yml'])
+            with open(os.path.join(output_dir, 'a.yml'), encoding='utf-8') as f:
+                self.assertEqual(yaml.safe_load(f), {'items': {'y1': {'source': 'y1'}}})
+
+
+if __name__ == '__main__':
+    unittest.main()
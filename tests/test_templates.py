@@ -0,0 +1,34 @@
+import unittest
+
+from src.utils import compile_templates, process_placeholders, render_templates
+
+
+class RenderTemplatesTest(unittest.TestCase):
+    """render_templates 的结果必须与对原始值调用 process_placeholders 一致。"""
+
+    def assert_same_as_process_placeholders(self, value, context):
+        compiled = compile_templates(value, context)
+        self.assertEqual(render_templates(compiled, context), process_placeholders(value, context))
+
+    def test_replacement_forms_new_placeholder(self):
+        context = {'content_id': 'a', 'a': 5}
+        self.assertEqual(render_templates(compile_templates('{{content_id}}', context), context), 5)
+        self.assert_same_as_process_placeholders('{{content_id}}', context)
+
+    def test_literal_braces_around_placeholder(self):
+        context = {'b': 'a', 'a': '1'}
+        self.assertEqual(render_templates(compile_templates('x{{{b}}x', context), context), 'x{1x')
+        self.assert_same_as_process_placeholders('x{{{b}}x', context)
+
+    def test_nested_values(self):
+        context = {'content_id': 'a', 'a': 5, 'rarity': 'rare'}
+        value = {'{rarity}': ['{{content_id}}', 'A {rarity} item'], 'plain': '{missing}'}
+        self.assert_same_as_process_placeholders(value, context)
+
+    def test_replacement_containing_braces(self):
+        context = {'a': '{b}', 'b': 'x'}
+        self.assert_same_as_process_placeholders('{a}-{b}', context)
+
+
+if __name__ == '__main__':
+    unittest.main()